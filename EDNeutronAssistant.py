@@ -1,18 +1,26 @@
 import os
 import sys
 import time
+import queue
 import webbrowser
 import tkinter as tk
 import tkinter.ttk as ttk
 import tkinter.messagebox
-import json
 import threading
+import multiprocessing
+
+# Startup time is measured from here, before the application modules are imported
+START_TIME = time.perf_counter()
 
 if __name__ == '__main__':
-    import gui
-    import utils
     import api_access
-    import menu
+    import tracker
+
+    # The headless daemon does not need any of the Tk frontend
+    if "--headless" not in sys.argv:
+        import gui
+        import menu
+        import autocomplete
 
 __version__ = "v3.1.1"
 
@@ -27,12 +35,23 @@ else:
 
 
 class MainApplication(ttk.Frame):
-    def __init__(self, master, *args, **kwargs):
+    """Tk frontend of a RouteTracker, showing its state and calculating new routes"""
+
+    def __init__(self, master, route_tracker, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.master = master
+        self.tracker = route_tracker
 
         self.title_bar = None
+        self.window_shown = False
+
+        # Versions found by the background update check
+        self.update_results = queue.Queue()
+        self.update_check_thread = None
+
+        # State changes of the tracker, they are made on its threads but widgets can only be changed in the Tk main loop
+        self.tracker_events = queue.Queue()
 
         # UI elements
         self.status_information_frame = gui.StatusInformation(self, self)
@@ -50,73 +69,112 @@ class MainApplication(ttk.Frame):
         self.route_selection = gui.RouteSelection(self, self)
         self.route_selection.grid(row=4, column=0, columnspan=2, ipadx=40, sticky="W")
 
-        # Setting variables
-        self.verbose = False
-        self.poll_rate = 1
+        autocomplete.SYSTEM_NAME_INDEX = self.tracker.system_name_index
 
-        if os.name == "nt":
-            self.config_path = os.path.join(os.getenv("APPDATA"), "EDNeutronAssistant")
-        else:
-            self.config_path = os.path.join(os.path.expanduser("~"), ".config", "EDNeutronAssistant")
+        self.tracker.add_observer(tracker.QueueObserver(self.tracker_events))
+        self.after(50, self.poll_tracker_events)
 
-        self.configuration = {"current_system": "", "ship_coriolis_build": {}, "jump_range_coriolis": 0,
-                              "jump_range_log": 0, "commander_name": ""}
+    def print_log(self, *args):
+        self.tracker.print_log(*args)
 
-        try:
-            self.configuration = json.load(open(os.path.join(self.config_path, "data.json"), "r"))
-        except FileNotFoundError:
-            pass
+    def poll_tracker_events(self):
+        """Apply the state changes of the tracker to the widgets from the Tk main loop"""
 
-        self.configuration["current_system_display"] = ""
-        self.configuration["jump_range_coriolis_display"] = 0
-        self.configuration["commander_name_display"] = ""
+        while True:
+            try:
+                event, args = self.tracker_events.get_nowait()
+            except queue.Empty:
+                break
+            getattr(self, event)(*args)
 
-        self.configuration["exiting"] = False
-        self.configuration["last_copied"] = ""
+        self.after(50, self.poll_tracker_events)
 
-        # Creating working directory
-        if not os.path.isdir(self.config_path):
-            os.makedirs(self.config_path)
+    def on_log(self, entry: str):
+        self.log_frame.add_to_log(entry)
 
-        self.write_config()
+    def on_commander_name(self, name: str):
+        self.status_information_frame.update_cmdr_lbl(name)
 
-        # --- Running initialization ---
-        self.print_log("Initializing")
+    def on_current_system(self, system: str):
+        # Update simple route start system
+        self.route_selection.simple_route_selection_tab.from_combobox.set(system)
+        self.route_selection.simple_route_selection_tab.from_combobox.set_completion_list([system])
 
-        threading.Thread(target=self.application_loop).start()
+        # Update exact route start system
+        self.route_selection.exact_route_selection_tab.from_combobox.set(system)
+        self.route_selection.exact_route_selection_tab.from_combobox.set_completion_list([system])
 
-        if "route" in self.configuration and self.configuration["route"]:
-            self.print_log("Found existing route")
+        # Update status information current system
+        self.status_information_frame.update_current_system_lbl(system)
 
-        self.print_log("Initialization complete")
+    def on_jump_range(self, jump_range: float):
+        # Update default jump range in simple neutron route calculator
+        self.route_selection.simple_route_selection_tab.jump_range_entry.delete(0, tk.END)
+        self.route_selection.simple_route_selection_tab.jump_range_entry.insert(0, jump_range)
 
-    def print_log(self, *args):
-        """Print content to file and console along with a timestamp"""
+    def on_next_system(self, system: str, distance: float, jumps: int, is_neutron: bool, current: int, total: int,
+                       destination: str):
+        self.status_information_frame.update_next_system_info(system, distance, jumps, is_neutron)
+        self.status_information_frame.update_progress_lbl(current, total)
+        self.status_information_frame.set_destination(destination)
 
-        t = time.strftime("%T")
-        print(t, *args)
+    def on_route_completed(self, total: int):
+        self.status_information_frame.update_progress_lbl(total, total)
+        self.status_information_frame.reset_information()
 
-        entry = t + " "
-        for arg in args:
-            entry += arg
+    def on_route_reset(self):
+        self.status_information_frame.reset_information()
 
-        self.log_frame.add_to_log(entry)
+    def on_window_shown(self, event):
+        """Everything that is not needed to show the window is started once it is shown"""
 
-        logs_dir = os.path.join(self.config_path, "logs")
+        if self.window_shown:
+            return
+        self.window_shown = True
 
-        if not os.path.isdir(logs_dir):
-            os.makedirs(logs_dir)
+        if self.tracker.verbose:
+            self.print_log(f"Window shown {time.perf_counter() - START_TIME:.3f} s after start")
 
-        with open(os.path.join(self.config_path, "logs",
-                               f"EDNeutronAssistant-{time.strftime('%Y-%m-%d')}.log"), "a") as f:
-            f.write(entry + "\n")
+        # Applied once the window is drawn, loading the theme images takes a while
+        if menu.USER_SETTINGS["theme"] != 0:
+            self.after_idle(self.apply_theme, menu.USER_SETTINGS["theme"])
 
-    def write_config(self):
-        """Writes the current configuration to the config file"""
-        with open(os.path.join(self.config_path, "data.json"), "w") as f:
-            json.dump(self.configuration, f, indent=2)
-        if self.verbose:
-            self.print_log("Saved configuration to file")
+        threading.Thread(target=self.tracker.start).start()
+
+        self.update_check_thread = threading.Thread(target=self.check_for_update, daemon=True)
+        self.update_check_thread.start()
+        self.after(200, self.poll_update_check)
+
+    def check_for_update(self):
+        import requests
+
+        self.print_log("Checking GitHub for updates")
+        try:
+            update, version = api_access.update_available(__version__)
+        except (requests.RequestException, KeyError, ValueError) as e:
+            self.print_log(f"Could not check for updates: {e}")
+            return
+
+        if update:
+            self.print_log(f"Found new version {version}")
+            self.update_results.put(version)
+        else:
+            self.print_log(f"Already running latest version")
+
+    def poll_update_check(self):
+        """Ask to download a new version from the Tk main loop, dialogs can not be opened from other threads"""
+
+        try:
+            self.update_results.get_nowait()
+        except queue.Empty:
+            if self.update_check_thread.is_alive():
+                self.after(200, self.poll_update_check)
+            return
+
+        update_message = tk.messagebox.askyesno("Update Available",
+                                                "A new version of EDNeutronAssistant is available. Download now?")
+        if update_message:
+            webbrowser.open_new_tab(f"https://github.com/Gobidev/EDNeutronAssistant/releases/latest")
 
     def change_state_of_all_calculate_buttons(self, state: str):
         self.route_selection.simple_route_selection_tab.calculate_button.configure(state=state)
@@ -149,263 +207,36 @@ class MainApplication(ttk.Frame):
                 self.route_selection.select(1)
                 self.route_selection.select(current_page)
 
-    def application_loop(self):
-        """Main loop of application running checks in time intervals of self.poll_rate"""
-
-        def update_commander_name(parsed_log_: list):
-
-            def set_commander_name(name: str):
-                self.status_information_frame.update_cmdr_lbl(name)
-                self.configuration["commander_name_display"] = name
-                self.configuration["commander_name"] = name
-                self.write_config()
-
-            log_commander_name = utils.get_commander_name_from_log(parsed_log_, log_function=self.print_log,
-                                                                   verbose=self.verbose)
-            config_commander_name = self.configuration["commander_name"]
-            displayed_commander_name = self.configuration["commander_name_display"]
-
-            # case 1: log commander name is not blank
-            # -> if name not already displayed, set log name
-            if log_commander_name != "":
-                if displayed_commander_name != log_commander_name:
-                    set_commander_name(log_commander_name)
+    def terminate(self):
+        self.tracker.stop()
+        self.master.destroy()
 
-            # case 2: log commander name is blank
-            # -> if name not already displayed, set config name
-            else:
-                if displayed_commander_name != config_commander_name:
-                    set_commander_name(config_commander_name)
 
-        def update_current_system(parsed_log_: list):
+if __name__ == '__main__':
+    # Required for the journal backfill process pool in frozen executables
+    multiprocessing.freeze_support()
 
-            def set_current_system(system: str):
-                self.print_log(f"Entered system {system}")
+    route_tracker = tracker.RouteTracker(tracker.get_config_path(), PATH)
 
-                # Update configuration
-                self.configuration["current_system"] = system
-                self.configuration["current_system_display"] = system
+    # Enable verbose when called with -v flag
+    if "-v" in sys.argv or "--verbose" in sys.argv:
+        route_tracker.verbose = True
 
-                self.write_config()
-
-                # Update simple route start system
-                self.route_selection.simple_route_selection_tab.from_combobox.set(system)
-                self.route_selection.simple_route_selection_tab.from_combobox.set_completion_list([system])
-
-                # Update exact route start system
-                self.route_selection.exact_route_selection_tab.from_combobox.set(system)
-                self.route_selection.exact_route_selection_tab.from_combobox.set_completion_list([system])
-
-                # Update status information current system
-                self.status_information_frame.update_current_system_lbl(system)
-
-            log_current_system = utils.get_current_system_from_log(parsed_log_, log_function=self.print_log,
-                                                                   verbose=self.verbose)
-            config_current_system = self.configuration["current_system"]
-            displayed_current_system = self.configuration["current_system_display"]
-
-            # case 1: log current system is not blank
-            # -> if not already set, set log current system
-            if log_current_system != "":
-                if displayed_current_system != log_current_system:
-                    set_current_system(log_current_system)
-
-            # case 2: log current system is blank
-            # ->  if not already set, set config current system
-            else:
-                if displayed_current_system != config_current_system:
-                    set_current_system(config_current_system)
-
-        def update_ship_build(parsed_log_: list):
-
-            def set_new_ship_build(loadout_event: dict):
-
-                # Convert build to coriolis build
-                build = api_access.convert_loadout_event_to_coriolis(loadout_event)
-                jump_range_coriolis = build["stats"]["fullTankRange"]
-
-                self.configuration["ship_coriolis_build"] = build
-                self.configuration["jump_range_coriolis"] = jump_range_coriolis
-                self.configuration["jump_range_coriolis_display"] = jump_range_coriolis
-                self.configuration["jump_range_log"] = round(loadout_event["MaxJumpRange"], 2)
-
-                self.write_config()
-
-                # Update default jump range in simple neutron route calculator
-                self.route_selection.simple_route_selection_tab.jump_range_entry.delete(0, tk.END)
-                self.route_selection.simple_route_selection_tab.jump_range_entry.insert(0, jump_range_coriolis)
-
-            def update_displayed_jump_range(jump_range: float):
-                self.configuration["jump_range_coriolis_display"] = jump_range
-
-                # Update default jump range in simple neutron route calculator
-                self.route_selection.simple_route_selection_tab.jump_range_entry.delete(0, tk.END)
-                self.route_selection.simple_route_selection_tab.jump_range_entry.insert(0, jump_range)
-
-            # To test if the ship build has changed, we compare the "MaxJumpRange" attribute of the game log, to avoid
-            # unnecessary conversions to coriolis builds
-
-            latest_log_loadout_event = utils.get_latest_loadout_event_from_log(parsed_log_)
-            config_coriolis_build = self.configuration["ship_coriolis_build"]
-            config_ship_log_range = self.configuration["jump_range_log"]
-            displayed_ship_jump_range = self.configuration["jump_range_coriolis_display"]
-
-            # case 1: no log loadout events were found
-            # -> if configuration contains coriolis build, use it to update display
-            if not latest_log_loadout_event:
-                if config_coriolis_build:
-                    config_coriolis_build_jump_range = config_coriolis_build["stats"]["fullTankRange"]
-                    if config_coriolis_build_jump_range != displayed_ship_jump_range:
-                        update_displayed_jump_range(config_coriolis_build_jump_range)
-
-            # case 2: log loadout event was found
-            # -> compare log jump range to config log jump range, if not equal, update build
-            else:
-                new_build_log_jump_range = round(latest_log_loadout_event["MaxJumpRange"], 2)
-                if new_build_log_jump_range != config_ship_log_range:
-                    set_new_ship_build(latest_log_loadout_event)
-
-                # If jump range was not displayed yet, set saved coriolis range
-                elif not displayed_ship_jump_range:
-                    update_displayed_jump_range(config_coriolis_build["stats"]["fullTankRange"])
-
-        def update_simple_route(route_: list):
-
-            # Get all route systems
-            all_route_systems = []
-            for route_entry in route_:
-                if "system" in route_entry:
-                    all_route_systems.append(route_entry["system"])
-
-            # Get current system from configuration
-            current_system = self.configuration["current_system"]
-
-            destination = all_route_systems[-1]
-
-            # Get next system and next system information
-            if current_system in all_route_systems:
-                # Check if route is completed
-                if current_system == all_route_systems[-1]:
-                    self.print_log("Route completed")
-                    self.configuration["route"] = []
-                    self.status_information_frame.update_progress_lbl(len(all_route_systems), len(all_route_systems))
-                    self.status_information_frame.reset_information()
-                    return
-                else:
-                    index_current_system = all_route_systems.index(current_system)
-                    index_next_system = all_route_systems.index(current_system) + 1
-
-                    next_system = all_route_systems[index_next_system]
-                    next_system_distance = round(route_[index_current_system]["distance_left"] -
-                                                 route_[index_next_system]["distance_left"], 2)
-                    next_system_jumps = int(route_[index_next_system]["jumps"])
-                    next_system_is_neutron = route_[index_next_system]["neutron_star"]
-
-                    self.configuration["last_route_system"] = current_system
-            else:
-                # Current system is off route
-                index_current_system = all_route_systems.index(self.configuration["last_route_system"])
-                next_system = all_route_systems[index_current_system + 1]
-                next_system_distance = api_access.get_distance_between_systems(current_system, next_system,
-                                                                               log_function=self.print_log,
-                                                                               verbose=self.verbose)
-                next_system_is_neutron = route_[all_route_systems.index("next_system")]["neutron_star"]
-                next_system_jumps = round(next_system_distance / self.configuration["ship_build"]["stats"][
-                    "fullTankRange"], 2)
-
-            if next_system:
-                if next_system != self.configuration["last_copied"]:
-                    self.status_information_frame.update_next_system_info(next_system, next_system_distance,
-                                                                          next_system_jumps, next_system_is_neutron)
-                    self.status_information_frame.update_progress_lbl(index_current_system + 1, len(all_route_systems))
-                    self.status_information_frame.set_destination(destination)
-                    utils.copy_system_to_clipboard(next_system, log_function=self.print_log)
-                    self.configuration["last_copied"] = next_system
-            else:
-                self.status_information_frame.reset_information()
-
-        def update_exact_route(route_):
-            # Get all route systems
-            all_route_systems = []
-            for route_entry in route_:
-                if "name" in route_entry:
-                    all_route_systems.append(route_entry["name"])
-
-            # Get current system from configuration
-            current_system = self.configuration["current_system"]
-
-            destination = all_route_systems[-1]
-
-            # Get next system and next system information
-            if current_system in all_route_systems:
-                # Check if route is completed
-                if current_system == all_route_systems[-1]:
-                    self.print_log("Route completed")
-                    self.configuration["route"] = []
-                    self.status_information_frame.update_progress_lbl(len(all_route_systems), len(all_route_systems))
-                    self.status_information_frame.reset_information()
-                    return
-                else:
-                    index_current_system = all_route_systems.index(current_system)
-                    index_next_system = all_route_systems.index(current_system) + 1
-
-                    next_system = all_route_systems[index_next_system]
-                    next_system_distance = round(route_[index_next_system]["distance"] -
-                                                 route_[index_current_system]["distance"], 2)
-                    next_system_jumps = 1
-                    next_system_is_neutron = route_[index_next_system]["has_neutron"]
-
-                    self.configuration["last_route_system"] = current_system
-            else:
-                # Current system is off route
-                index_current_system = all_route_systems.index(self.configuration["last_route_system"])
-                next_system = all_route_systems[index_current_system + 1]
-                next_system_distance = api_access.get_distance_between_systems(current_system, next_system,
-                                                                               log_function=self.print_log,
-                                                                               verbose=self.verbose)
-                next_system_is_neutron = route_[all_route_systems.index("next_system")]["has_neutron"]
-                next_system_jumps = round(next_system_distance / self.configuration["ship_build"]["stats"][
-                    "fullTankRange"], 2)
-
-            if next_system:
-                if next_system != self.configuration["last_copied"]:
-                    self.status_information_frame.update_next_system_info(next_system, next_system_distance,
-                                                                          next_system_jumps, next_system_is_neutron)
-                    self.status_information_frame.update_progress_lbl(index_current_system + 1, len(all_route_systems))
-                    self.status_information_frame.set_destination(destination)
-                    utils.copy_system_to_clipboard(next_system, log_function=self.print_log)
-                    self.configuration["last_copied"] = next_system
-            else:
-                self.status_information_frame.reset_information()
-
-        while 1:
-            # Parse game log
-            parsed_log = utils.parse_game_log(verbose=self.verbose, log_function=self.print_log)
+    # Import system names for offline autocomplete, e.g. from an EDSM or Spansh dump
+    if "--import-systems" in sys.argv and sys.argv.index("--import-systems") + 1 < len(sys.argv):
+        threading.Thread(target=route_tracker.update_system_name_index,
+                         args=(sys.argv[sys.argv.index("--import-systems") + 1],)).start()
 
-            try:
-                update_commander_name(parsed_log)
-                update_current_system(parsed_log)
-                update_ship_build(parsed_log)
-            except RuntimeError:
-                continue
-
-            if "route" in self.configuration and self.configuration["route"]:
-                if self.configuration["route_type"] == "simple":
-                    update_simple_route(self.configuration["route"])
-                elif self.configuration["route_type"] == "exact":
-                    update_exact_route(self.configuration["route"])
-
-            if self.configuration["exiting"]:
-                break
+    # Import star data for the local route planner, e.g. from a Spansh galaxy dump
+    if "--import-stars" in sys.argv and sys.argv.index("--import-stars") + 1 < len(sys.argv):
+        threading.Thread(target=route_tracker.import_star_data,
+                         args=(sys.argv[sys.argv.index("--import-stars") + 1],)).start()
 
-            time.sleep(self.poll_rate)
+    # Follow the journal and copy systems without a window, status is printed to stdout
+    if "--headless" in sys.argv:
+        tracker.run_headless(route_tracker)
+        sys.exit()
 
-    def terminate(self):
-        self.configuration["exiting"] = True
-        self.master.destroy()
-
-
-if __name__ == '__main__':
     root = tk.Tk()
 
     root.resizable(False, False)
@@ -421,31 +252,13 @@ if __name__ == '__main__':
     if os.name == "nt":
         root.iconbitmap(default=icon_path)
 
-    ed_neutron_assistant = MainApplication(root, root)
+    ed_neutron_assistant = MainApplication(root, route_tracker, root)
     ed_neutron_assistant.grid(sticky="NEWS", padx=5, pady=5)
 
-    # Enable verbose when called with -v flag
-    if "-v" in sys.argv or "--verbose" in sys.argv:
-        ed_neutron_assistant.verbose = True
-
     # Exit program when closing
     root.protocol("WM_DELETE_WINDOW", ed_neutron_assistant.terminate)
 
-    # apply settings theme
-    if menu.USER_SETTINGS["theme"] != 0:
-        ed_neutron_assistant.apply_theme(menu.USER_SETTINGS["theme"])
-
-    # Check for update
-    ed_neutron_assistant.print_log("Checking GitHub for updates")
-    update, version = api_access.update_available(__version__)
-
-    if update:
-        ed_neutron_assistant.print_log(f"Found new version {version}")
-        update_message = tk.messagebox.askyesno("Update Available",
-                                                "A new version of EDNeutronAssistant is available. Download now?")
-        if update_message:
-            webbrowser.open_new_tab(f"https://github.com/Gobidev/EDNeutronAssistant/releases/latest")
-    else:
-        ed_neutron_assistant.print_log(f"Already running latest version")
+    # The tracker, theme and update check are started once the window is shown
+    root.bind("<Map>", ed_neutron_assistant.on_window_shown, add="+")
 
     root.mainloop()
@@ -1,19 +1,37 @@
 import os
 import json
+import typing
 import urllib.parse
-import requests
-import time
-import hashlib
+import concurrent.futures
 
+import job_poller
+import route_cache
+import module_data
+import ship_stats
 from EDNeutronAssistant import __version__
 
+# requests and the numpy based planner take longer to import than the window takes to show, they are imported on
+# first use
+if typing.TYPE_CHECKING:
+    import route_planner
+
 REQUEST_HEADERS = {"user-agent": f"EDNeutronAssistant_{__version__}"}
 
+# Base URLs of the APIs, can be changed to use a local stand-in server like mock_server.py
+SPANSH_API_URL = os.getenv("EDNA_SPANSH_API_URL", "https://www.spansh.co.uk/api").rstrip("/")
+EDSM_API_URL = os.getenv("EDNA_EDSM_API_URL", "https://www.edsm.net/api-v1").rstrip("/")
+CORIOLIS_API_URL = os.getenv("EDNA_CORIOLIS_API_URL", "https://coriolis-api.gobidev.de").rstrip("/")
+
+# Polls all outstanding Spansh route jobs
+SPANSH_JOB_POLLER = job_poller.SpanshJobPoller(f"{SPANSH_API_URL}/results/", headers=REQUEST_HEADERS)
+
 
-def update_available(current_version: str) -> (bool, str):
+def update_available(current_version: str, timeout: float = 5) -> (bool, str):
     """Check for available update on GitHub and return version if available"""
+    import requests
 
-    newest_version = requests.get("https://api.github.com/repos/Gobidev/EDNeutronAssistant/releases/latest").json()
+    newest_version = requests.get("https://api.github.com/repos/Gobidev/EDNeutronAssistant/releases/latest",
+                                  headers=REQUEST_HEADERS, timeout=timeout).json()
     newest_version = newest_version["tag_name"]
 
     if newest_version != current_version:
@@ -22,253 +40,220 @@ def update_available(current_version: str) -> (bool, str):
         return False, current_version
 
 
-def get_distance_between_systems(system1: str, system2: str, log_function=print, verbose=False) -> float:
-    """Calculate the distance between two systems using the EDSM API"""
-
-    if not (system1 and system2):
-        return 0
-
-    if verbose:
-        log_function(f"Calculating distance between systems {system1} and {system2}")
-
-    def get_coordinates(system: str) -> dict:
-        """Retrieve the coordinates of a system from the EDSM API"""
-
-        if verbose:
-            log_function(f"Retrieving coordinates of system {system} from EDSM API")
-
-        system = urllib.parse.quote_plus(system)
-        response = requests.get(f"https://www.edsm.net/api-v1/system?systemName={system}"
-                                f"&showCoordinates=1", headers=REQUEST_HEADERS)
-
-        coordinates = json.loads(response.text)["coords"]
+class CoordinatesUnavailableError(Exception):
+    """Raised if EDSM can not be reached or gives an invalid answer, the system might still be known"""
 
-        if verbose:
-            log_function(f"Coordinates of system {system} are {coordinates}")
 
-        return coordinates
+def get_system_coordinates(system: str, coordinate_store=None, log_function=print, verbose=False,
+                           timeout: float = 10) -> dict:
+    """Retrieve the coordinates of a system from the local coordinate store or the EDSM API, None if EDSM does not
+    know the system. Raises CoordinatesUnavailableError if EDSM can not be asked"""
+    import requests
 
-    s1coordinates = get_coordinates(system1)
-    s2coordinates = get_coordinates(system2)
-
-    distance = round(
-        ((s2coordinates["x"] - s1coordinates["x"]) ** 2 + (s2coordinates["y"] - s1coordinates["y"]) ** 2 +
-         (s2coordinates["z"] - s1coordinates["z"]) ** 2) ** (1 / 2), 2)
+    if coordinate_store:
+        coordinates = coordinate_store.get(system)
+        if coordinates:
+            return coordinates
 
     if verbose:
-        log_function(f"Distance between systems {system1} and {system2} is {distance}")
+        log_function(f"Retrieving coordinates of system {system} from EDSM API")
+
+    try:
+        response = requests.get(f"{EDSM_API_URL}/system?systemName={urllib.parse.quote_plus(system)}"
+                                f"&showCoordinates=1", headers=REQUEST_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        system_information = json.loads(response.text)
+    except (requests.RequestException, ValueError) as e:
+        raise CoordinatesUnavailableError(f"Could not retrieve coordinates of system {system}: {e}") from e
+
+    # EDSM answers with an empty list or object for unknown systems
+    if not isinstance(system_information, dict) or "coords" not in system_information:
+        log_function(f"Coordinates of system {system} are not known to EDSM")
+        return None
+    coordinates = system_information["coords"]
 
-    return distance
+    if verbose:
+        log_function(f"Coordinates of system {system} are {coordinates}")
 
+    if coordinate_store:
+        coordinate_store.put(system, coordinates)
 
-def convert_system_name_for_file(system_name: str) -> str:
-    """Convert ship name to match file name criteria"""
-    return system_name.replace(" ", "_").replace("*", "")
+    return coordinates
 
 
 def calc_simple_neutron_route(efficiency: int, ship_range: float, start_system: str, end_system: str,
-                              config_path: str, log_function=print) -> list:
-    """Use the Spansh API to calculate a neutron star route"""
+                              cache: route_cache.RouteCache, planner: "route_planner.NeutronPlanner" = None,
+                              log_function=print) -> list:
+    """Use the Spansh API to calculate a neutron star route, or the local planner if one is given"""
+    import requests
 
     log_function(f"Calculating route from {start_system} to {end_system} with efficiency {efficiency} and jump "
                  f"range {ship_range}")
 
-    routes_dir = os.path.join(config_path, "routes")
-
-    if not os.path.isdir(routes_dir):
-        os.makedirs(routes_dir)
-
-    filename = f"NeutronAssistantSimpleRoute-{efficiency}-{ship_range}-" \
-               f"{convert_system_name_for_file(start_system)}-{convert_system_name_for_file(end_system)}.json"
-
-    filename = os.path.join(routes_dir, filename)
+    params = route_cache.get_simple_route_params(efficiency, ship_range, start_system, end_system)
 
     # Test if route was calculated before
-    if not os.path.isfile(filename):
-        log_function("Route was not calculated before, requesting from API")
-
-        payload = {"efficiency": efficiency, "range": ship_range, "from": start_system, "to": end_system}
-        response = requests.post("https://www.spansh.co.uk/api/route", data=payload, headers=REQUEST_HEADERS)
-        job = eval(response.text)
-
-        log_function("Request sent, waiting for completion")
-
-        if "error" in job:
-            log_function(f"ERROR OCCURRED: {job['error']}")
-            return []
-
-        # Wait for job completion
-        while 1:
-            response = requests.get("https://www.spansh.co.uk/api/results/" + job["job"], headers=REQUEST_HEADERS)
-            response_dict = json.loads(response.text)
-            if response_dict["status"] == "ok":
-                log_function("Route successfully received")
-                break
-            time.sleep(1)
+    systems = cache.get(params)
+    if systems is not None:
+        log_function("Found existing route, reading")
+        return systems
 
-        systems = response_dict["result"]["system_jumps"]
+    systems = cache.get_slice(params)
+    if systems is not None:
+        log_function(f"Found existing route through {start_system}, using its remaining part")
+        return systems
 
-        # Write results to file
-        log_function("Saving route")
+    if planner:
+        log_function("Plotting route with local star data")
+        return planner.plot_route(start_system, end_system, ship_range, efficiency, log_function=log_function)
 
-        with open(filename, "w") as f:
-            json.dump(systems, f, indent=2)
-        log_function("Route has been saved")
+    log_function("Route was not calculated before, requesting from API")
 
-    else:
-        log_function("Found existing route, reading")
-        systems = json.load(open(filename, "r"))
-
-    return systems
+    payload = {"efficiency": efficiency, "range": ship_range, "from": start_system, "to": end_system}
+    response = requests.post(f"{SPANSH_API_URL}/route", data=payload, headers=REQUEST_HEADERS)
+    job = eval(response.text)
 
+    log_function("Request sent, waiting for completion")
 
-def calc_exact_neutron_route(start_system: str, end_system: str, ship_coriolis_build: dict, cargo: int,
-                             already_supercharged: bool, use_supercharge: bool, use_injections: bool,
-                             exclude_secondary_stars: bool, config_path: str, log_function=print) -> list:
-    """Use the Spansh API to calculate an exact neutron route"""
+    if "error" in job:
+        log_function(f"ERROR OCCURRED: {job['error']}")
+        return []
 
-    fsd_data = requests.get("https://raw.githubusercontent.com/EDCD/coriolis-data/"
-                            "master/modules/standard/frame_shift_drive.json").json()["fsd"]
+    # Wait for job completion
+    try:
+        response_dict = SPANSH_JOB_POLLER.submit(job["job"], timeout=5 * 60).result()
+    except concurrent.futures.CancelledError:
+        log_function("Route calculation cancelled")
+        return []
+    except job_poller.SpanshJobError as e:
+        log_function(f"ERROR OCCURRED: {e}")
+        return []
 
-    def calculate_optimal_mass(coriolis_build: dict) -> float:
-        build_fsd = coriolis_build["components"]["standard"]["frameShiftDrive"]
+    log_function("Route successfully received")
 
-        optimal_mass = 0
-        for fsd in fsd_data:
-            if fsd["class"] == build_fsd["class"] and fsd["rating"] == build_fsd["rating"]:
-                optimal_mass = fsd["optmass"]
+    systems = response_dict["result"]["system_jumps"]
 
-        # test if modified
-        if "blueprint" in build_fsd:
-            modification_grade = build_fsd["blueprint"]["grade"]
-            multiplier = build_fsd["blueprint"]["grades"][str(modification_grade)]["features"]["optmass"][1]
+    # Write results to cache
+    log_function("Saving route")
+    cache.put(params, systems)
+    log_function("Route has been saved")
 
-            # test for experimental effect
-            if "special" in build_fsd["blueprint"]:
-                if build_fsd["blueprint"]["special"]["name"] == "Mass Manager":
-                    multiplier += .062
+    return systems
 
-            optimal_mass *= multiplier + 1
 
-        return round(optimal_mass)
+def log_fuel_warnings(payload: dict, systems: list, log_function=print):
+    """Simulate the fuel along an exact route and warn about systems that are reached with little fuel"""
+    import jump_physics
 
-    def get_fuel_power_of_build(coriolis_build: dict) -> float:
-        build_fsd = coriolis_build["components"]["standard"]["frameShiftDrive"]
+    if len(systems) < 2:
+        return
 
-        fuel_power = 0
-        for fsd in fsd_data:
-            if fsd["class"] == build_fsd["class"] and fsd["rating"] == build_fsd["rating"]:
-                fuel_power = fsd["fuelpower"]
+    fsd = jump_physics.get_fsd_parameters(payload)
 
-        return fuel_power
+    # Spansh only routes through neutron stars to supercharge there
+    supercharges = [jump_physics.NEUTRON_SUPERCHARGE if payload["use_supercharge"] and
+                    systems[index - 1].get("has_neutron") else 1.0 for index in range(1, len(systems))]
+    if payload["is_supercharged"]:
+        supercharges[0] = jump_physics.NEUTRON_SUPERCHARGE
 
-    def get_fuel_multiplier_of_build(coriolis_build: dict) -> float:
-        build_fsd = coriolis_build["components"]["standard"]["frameShiftDrive"]
+    arrival_fuel, fuel_used = jump_physics.get_route_fuel(
+        fsd, [route_entry["distance"] for route_entry in systems], [1.0] + supercharges,
+        [bool(route_entry.get("must_refuel")) for route_entry in systems], payload["cargo"])
 
-        fuel_multiplier = 0
-        for fsd in fsd_data:
-            if fsd["class"] == build_fsd["class"] and fsd["rating"] == build_fsd["rating"]:
-                fuel_multiplier = fsd["fuelmul"]
+    for index in jump_physics.get_fuel_warnings(fsd, arrival_fuel, fuel_used):
+        if fuel_used[index] > fsd.max_fuel_per_jump:
+            log_function(f"WARNING: Jump to {systems[index]['name']} is out of range")
+        else:
+            log_function(f"WARNING: Low fuel on arrival at {systems[index]['name']}, {arrival_fuel[index]:.2f} t left")
 
-        return fuel_multiplier
 
-    def get_fsd_fuel_usage_of_build(coriolis_build: dict) -> float:
-        build_fsd = coriolis_build["components"]["standard"]["frameShiftDrive"]
+def calc_exact_neutron_route(start_system: str, end_system: str, ship_coriolis_build: dict, cargo: int,
+                             already_supercharged: bool, use_supercharge: bool, use_injections: bool,
+                             exclude_secondary_stars: bool, cache: route_cache.RouteCache,
+                             modules: module_data.ModuleData, log_function=print) -> list:
+    """Use the Spansh API to calculate an exact neutron route"""
+    import requests
 
-        fsd_fuel_usage = 0
-        for fsd in fsd_data:
-            if fsd["class"] == build_fsd["class"] and fsd["rating"] == build_fsd["rating"]:
-                fsd_fuel_usage = fsd["maxfuel"]
+    log_function(f"Calculating exact route from {start_system} to {end_system}")
 
-        return fsd_fuel_usage
+    build_fsd = ship_coriolis_build["components"]["standard"]["frameShiftDrive"]
+    fsd = modules.get_fsd(build_fsd["class"], build_fsd["rating"])
+    if fsd is None:
+        log_function(f"ERROR OCCURRED: Unknown frame shift drive {build_fsd['class']}{build_fsd['rating']}")
+        return []
+
+    payload = {
+        "source": start_system,
+        "destination": end_system,
+        "is_supercharged": 1 if already_supercharged else 0,
+        "use_supercharge": 1 if use_supercharge else 0,
+        "exclude_secondary": 1 if exclude_secondary_stars else 0,
+        "tank_size": ship_coriolis_build["stats"]["fuelCapacity"],
+        "cargo": cargo,
+        "optimal_mass": ship_stats.get_optimal_mass(ship_coriolis_build, fsd),
+        "base_mass": ship_coriolis_build["stats"]["unladenMass"] + ship_coriolis_build["stats"][
+            "reserveFuelCapacity"],
+        "internal_tank_size": ship_coriolis_build["stats"]["reserveFuelCapacity"],
+        "max_fuel_per_jump": build_fsd.get("maxfuel", fsd.maxfuel),
+        "range_boost": ship_stats.get_range_boost(ship_coriolis_build),
+        "fuel_power": fsd.fuelpower,
+        "fuel_multiplier": fsd.fuelmul,
+        "ship_build": ship_coriolis_build
+    }
+
+    params = route_cache.get_exact_route_params(start_system, end_system, payload, use_injections)
 
-    def calculate_range_boost(coriolis_build: dict) -> float:
-        class_boost_dict = {"1": 4.0, "2": 6.0, "3": 7.8, "4": 9.3, "5": 10.5}
+    # Test if route was calculated before
+    systems = cache.get(params)
+    if systems is not None:
+        log_function("Found existing route, reading")
+        log_fuel_warnings(payload, systems, log_function=log_function)
+        return systems
 
-        boost = 0.0
-        for module in coriolis_build["components"]["internal"]:
-            if module and "group" in module and module["group"] == "Guardian Frame Shift Drive Booster":
-                boost = class_boost_dict[str(module["class"])]
+    systems = cache.get_slice(params)
+    if systems is not None:
+        log_function(f"Found existing route through {start_system}, using its remaining part")
+        log_fuel_warnings(payload, systems, log_function=log_function)
+        return systems
 
-        return boost
+    log_function("Route was not calculated before, requesting from API")
+    log_function("This might take a while")
 
-    log_function(f"Calculating exact route from {start_system} to {end_system}")
+    response = requests.post(f"{SPANSH_API_URL}/generic/route", data=payload, headers=REQUEST_HEADERS)
+    job = eval(response.text)
 
-    routes_dir = os.path.join(config_path, "routes")
+    log_function("Request sent, waiting for completion")
 
-    if not os.path.isdir(routes_dir):
-        os.makedirs(routes_dir)
+    if "error" in job:
+        log_function(f"ERROR OCCURRED: {job['error']}")
+        return []
 
-    ship_code_hash = hashlib.md5(ship_coriolis_build["references"][0]["code"].encode("utf-8")).hexdigest()[:5]
-    filename = f"NeutronAssistantExactRoute--" \
-               f"{convert_system_name_for_file(start_system)}-" \
-               f"{convert_system_name_for_file(end_system)}-{ship_code_hash}-{cargo}-" \
-               f"{'Y' if already_supercharged else 'N'}-" \
-               f"{'Y' if use_supercharge else 'N'}-{'Y' if use_injections else 'N'}-" \
-               f"{'Y' if exclude_secondary_stars else 'N'}.json "
+    # Wait for job completion
+    try:
+        response_dict = SPANSH_JOB_POLLER.submit(job["job"], timeout=30 * 60).result()
+    except concurrent.futures.CancelledError:
+        log_function("Route calculation cancelled")
+        return []
+    except job_poller.SpanshJobError as e:
+        log_function(f"ERROR OCCURRED: {e}")
+        return []
 
-    filename = os.path.join(routes_dir, filename)
+    log_function("Route successfully received")
 
-    # Test if route was calculated before
-    if not os.path.isfile(filename):
-        log_function("Route was not calculated before, requesting from API")
-        log_function("This might take a while")
-
-        payload = {
-            "source": start_system,
-            "destination": end_system,
-            "is_supercharged": 1 if already_supercharged else 0,
-            "use_supercharge": 1 if use_supercharge else 0,
-            "exclude_secondary": 1 if exclude_secondary_stars else 0,
-            "tank_size": ship_coriolis_build["stats"]["fuelCapacity"],
-            "cargo": cargo,
-            "optimal_mass": calculate_optimal_mass(ship_coriolis_build),
-            "base_mass": ship_coriolis_build["stats"]["unladenMass"] + ship_coriolis_build["stats"][
-                "reserveFuelCapacity"],
-            "internal_tank_size": ship_coriolis_build["stats"]["reserveFuelCapacity"],
-            "max_fuel_per_jump": get_fsd_fuel_usage_of_build(ship_coriolis_build),
-            "range_boost": calculate_range_boost(ship_coriolis_build),
-            "fuel_power": get_fuel_power_of_build(ship_coriolis_build),
-            "fuel_multiplier": get_fuel_multiplier_of_build(ship_coriolis_build),
-            "ship_build": ship_coriolis_build
-        }
-
-        response = requests.post("https://www.spansh.co.uk/api/generic/route", data=payload, headers=REQUEST_HEADERS)
-        job = eval(response.text)
-
-        log_function("Request sent, waiting for completion")
-
-        if "error" in job:
-            log_function(f"ERROR OCCURRED: {job['error']}")
-            return []
-
-        # Wait for job completion
-        while 1:
-            response = requests.get("https://www.spansh.co.uk/api/results/" + job["job"], headers=REQUEST_HEADERS)
-            response_dict = json.loads(response.text)
-            if response_dict["status"] == "ok":
-                log_function("Route successfully received")
-                break
-            time.sleep(4)
-
-        systems = response_dict["result"]["jumps"]
-
-        # Write results to file
-        log_function("Saving route")
-
-        with open(filename, "w") as f:
-            json.dump(systems, f, indent=2)
-        log_function("Route has been saved")
+    systems = response_dict["result"]["jumps"]
 
-    else:
-        log_function("Found existing route, reading")
-        systems = json.load(open(filename, "r"))
+    # Write results to cache
+    log_function("Saving route")
+    cache.put(params, systems)
+    log_function("Route has been saved")
 
+    log_fuel_warnings(payload, systems, log_function=log_function)
     return systems
 
 
 def convert_loadout_event_to_coriolis(loadout_event: dict) -> dict:
     """Convert loadout event to coriolis ship build standard"""
+    import requests
 
-    return json.loads(requests.post("https://coriolis-api.gobidev.de/convert", json=loadout_event,
+    return json.loads(requests.post(f"{CORIOLIS_API_URL}/convert", json=loadout_event,
                                     headers=REQUEST_HEADERS).text)
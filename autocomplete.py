@@ -1,14 +1,85 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 import json
-import requests
+import queue
 import threading
 import urllib.parse
 
+import api_access
+import coordinates
+import system_index
+
+# Local index of known system names, set by the application once it is opened
+SYSTEM_NAME_INDEX = None
+
+
+class SystemSuggestionWorker:
+    """Single background thread that requests system name suggestions for all comboboxes. Requests that were
+    superseded by a newer request of the same combobox are discarded without being sent"""
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, combobox, generation: int, query: str):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.worker_loop, daemon=True)
+                self.thread.start()
+
+        self.requests.put((combobox, generation, query))
+
+    @staticmethod
+    def request_completions(query: str) -> list:
+        """Return the system names Spansh suggests for a query, None if the request failed"""
+        # Imported on first use, requests is not needed to show the window
+        import requests
+
+        try:
+            response = requests.get(f"{api_access.SPANSH_API_URL}/systems?q={urllib.parse.quote_plus(query)}",
+                                    headers=api_access.REQUEST_HEADERS, timeout=10)
+            completions = json.loads(response.text)
+        except (requests.RequestException, ValueError):
+            return None
+
+        # Throttled and failed requests answer with an error object
+        if not response.ok or not isinstance(completions, list) or \
+                not all(isinstance(completion, str) for completion in completions):
+            return None
+
+        return completions
+
+    def worker_loop(self):
+        while 1:
+            pending = [self.requests.get()]
+            while not self.requests.empty():
+                pending.append(self.requests.get_nowait())
+
+            # Only the newest request of each combobox is still relevant
+            newest_requests = {}
+            for combobox, generation, query in pending:
+                newest_requests[combobox] = (generation, query)
+
+            for combobox, (generation, query) in newest_requests.items():
+                # Stale requests are answered without suggestions, so the combobox stops waiting for them
+                completions = None
+                if generation == combobox.generation:
+                    completions = self.request_completions(query)
+
+                # Handed to the Tk main loop, widgets must not be touched from this thread
+                combobox.results.put((generation, query, completions))
+
+
+SUGGESTION_WORKER = SystemSuggestionWorker()
+
 
 class SystemAutocompleteCombobox(ttk.Combobox):
 
-    def __init__(self, *args, **kwargs):
+    # Spansh returns at most this many suggestions, shorter lists contain all systems starting with the query
+    remote_result_limit = 10
+
+    def __init__(self, *args, debounce_delay: int = 300, **kwargs):
         ttk.Combobox.__init__(self, *args, **kwargs)
         self.completion_list = []
         self.hits = []
@@ -17,6 +88,19 @@ class SystemAutocompleteCombobox(ttk.Combobox):
         self.bind('<KeyRelease>', self.handle_keyrelease)
         self['values'] = self.completion_list
 
+        # Milliseconds without typing before suggestions are requested
+        self.debounce_delay = debounce_delay
+        self.debounce_job = None
+
+        # Incremented with every change of the text, responses to requests for older texts are stale
+        self.generation = 0
+        self.requested_generation = 0
+        self.results = queue.Queue()
+        self.polling_results = False
+
+        # Lower case query -> suggestions
+        self.suggestion_cache = coordinates.LRUCache(256)
+
     def set_completion_list(self, completion_list):
         self.completion_list = sorted(completion_list, key=str.lower)
         self.hits = []
@@ -50,7 +134,14 @@ class SystemAutocompleteCombobox(ttk.Combobox):
 
     def handle_keyrelease(self, event):
 
-        threading.Thread(target=self.update_completion_list).start()
+        if len(event.keysym) == 1 or event.keysym in ("BackSpace", "Delete"):
+            self.generation += 1
+
+            # Local suggestions are instant, remote suggestions are only requested once typing paused
+            self.show_local_suggestions()
+            if self.debounce_job:
+                self.after_cancel(self.debounce_job)
+            self.debounce_job = self.after(self.debounce_delay, self.update_completion_list)
 
         if event.keysym == "BackSpace":
             self.delete(self.index(tk.INSERT), tk.END)
@@ -66,8 +157,84 @@ class SystemAutocompleteCombobox(ttk.Combobox):
         if len(event.keysym) == 1:
             self.autocomplete()
 
+    def get_local_suggestions(self, query: str) -> (list, bool):
+        """Return suggestions from the local system name index and whether they start with the query. Falls back to
+        typo tolerant matching if no system starts with the query"""
+
+        if SYSTEM_NAME_INDEX is None:
+            return [], False
+
+        suggestions = SYSTEM_NAME_INDEX.search(query, limit=self.remote_result_limit)
+        if suggestions:
+            return suggestions, True
+
+        return SYSTEM_NAME_INDEX.fuzzy_search(query, limit=self.remote_result_limit), False
+
+    def show_local_suggestions(self):
+        query = self.get()
+        if query:
+            suggestions, _ = self.get_local_suggestions(query)
+            if suggestions:
+                self.set_completion_list(suggestions)
+
+    def get_cached_suggestions(self, query: str) -> (list, bool):
+        """Return cached suggestions for a query and whether they are complete. Suggestions of a shorter prefix are
+        filtered if there is no entry for the query itself"""
+
+        query = query.lower()
+
+        if query in self.suggestion_cache:
+            return self.suggestion_cache.get(query), True
+
+        for prefix_length in range(len(query) - 1, 0, -1):
+            prefix_suggestions = self.suggestion_cache.get(query[:prefix_length])
+            if prefix_suggestions is not None:
+                suggestions = [system for system in prefix_suggestions if system.lower().startswith(query)]
+                return suggestions, len(prefix_suggestions) < self.remote_result_limit
+
+        return None, False
+
     def update_completion_list(self):
-        self.set_completion_list(
-            json.loads(requests.get(
-                f"https://www.spansh.co.uk/api/systems?q={urllib.parse.quote_plus(self.get())}").text))
-        print(self.completion_list)
+        self.debounce_job = None
+
+        query = self.get()
+        if not query:
+            return
+
+        local_suggestions, prefix_match = self.get_local_suggestions(query)
+        suggestions, complete = self.get_cached_suggestions(query)
+        if suggestions is not None:
+            self.set_completion_list(system_index.merge_suggestions(local_suggestions, suggestions))
+
+        # The remote endpoint is only asked if the local index can not fill the list
+        if complete or (prefix_match and len(local_suggestions) >= self.remote_result_limit):
+            return
+
+        self.requested_generation = self.generation
+        SUGGESTION_WORKER.submit(self, self.generation, query)
+
+        if not self.polling_results:
+            self.polling_results = True
+            self.after(50, self.apply_results)
+
+    def apply_results(self):
+        """Apply suggestions received by the worker, runs in the Tk main loop"""
+
+        latest_generation = 0
+        while not self.results.empty():
+            generation, query, completions = self.results.get_nowait()
+            latest_generation = max(latest_generation, generation)
+
+            if completions is None:
+                continue
+
+            self.suggestion_cache.put(query.lower(), completions)
+            if generation == self.generation:
+                self.set_completion_list(system_index.merge_suggestions(self.get_local_suggestions(query)[0],
+                                                                        completions))
+
+        # Keep checking until the response to the newest request arrived
+        if latest_generation >= self.requested_generation:
+            self.polling_results = False
+        else:
+            self.after(50, self.apply_results)
@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import tracemalloc
+
+import utils
+import journal
+import route_model
+import route_planner
+import configuration
+import log_writer
+from EDNeutronAssistant import __version__
+
+# Events that are common in real journals but irrelevant to the application, mixed between the jumps
+FILLER_EVENTS = [
+    {"event": "Music", "MusicTrack": "Supercruise"},
+    {"event": "ReceiveText", "From": "", "Message": "$COMMS_entered:#name=Synthetic;", "Channel": "npc"},
+    {"event": "FuelScoop", "Scooped": 5.0, "Total": 32.0},
+    {"event": "Scan", "ScanType": "AutoScan", "BodyName": "Synthetic A", "BodyID": 1, "DistanceFromArrivalLS": 0.0,
+     "StarType": "K", "StellarMass": 0.7, "Radius": 500000000.0, "Landable": False},
+    {"event": "StartJump", "JumpType": "Hyperspace", "StarClass": "K"},
+    {"event": "FSSDiscoveryScan", "Progress": 0.2, "BodyCount": 12, "NonBodyCount": 3}
+]
+
+
+def get_timestamp(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def generate_journal_lines(event_count: int, seed: int = 0) -> list:
+    """Synthetic journal with a session header, a loadout and jumps between filler events"""
+
+    rng = random.Random(seed)
+    start_time = 1600000000
+
+    header = [
+        {"event": "Fileheader", "part": 1, "language": "English/UK", "gameversion": "4.0.0.1000", "build": "r1"},
+        {"event": "Commander", "FID": "F1", "Name": "Synthetic"},
+        {"event": "LoadGame", "FID": "F1", "Commander": "Synthetic", "Ship": "Anaconda", "ShipID": 1},
+        {"event": "Location", "StarSystem": "Synthetic 0", "SystemAddress": 0, "StarPos": [0.0, 0.0, 0.0]},
+        {"event": "Loadout", "Ship": "anaconda", "ShipID": 1, "UnladenMass": 400.5, "CargoCapacity": 0,
+         "MaxJumpRange": 58.4, "FuelCapacity": {"Main": 32.0, "Reserve": 1.07}, "Modules": [
+            {"Slot": "FrameShiftDrive", "Item": "int_hyperdrive_size5_class5"}]}
+    ]
+
+    lines = []
+    position = [0.0, 0.0, 0.0]
+    for index in range(event_count):
+        if index < len(header):
+            entry = dict(header[index])
+        elif rng.random() < .1:
+            position = [round(coordinate + rng.uniform(-50, 50), 5) for coordinate in position]
+            entry = {"event": "FSDJump", "StarSystem": f"Synthetic {index}", "SystemAddress": index,
+                     "StarPos": position, "JumpDist": 42.0, "FuelUsed": 2.5, "FuelLevel": 29.5}
+        else:
+            entry = dict(rng.choice(FILLER_EVENTS))
+
+        lines.append(json.dumps({"timestamp": get_timestamp(start_time + index), **entry},
+                                separators=(", ", ":")))
+
+    return lines
+
+
+def write_journal(directory: str, lines: list) -> str:
+    filename = os.path.join(directory, "Journal.2020-09-13T120000.01.log")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return filename
+
+
+def generate_route(hop_count: int, route_type: str, seed: int = 0) -> list:
+    """Synthetic route in the schema of the Spansh simple (system_jumps) or exact (jumps) results"""
+
+    rng = random.Random(seed)
+
+    positions = [(0.0, 0.0, 0.0)]
+    for _ in range(hop_count - 1):
+        x, y, z = positions[-1]
+        positions.append((x + rng.uniform(10, 200), y + rng.uniform(-20, 20), z + rng.uniform(-20, 20)))
+
+    end = positions[-1]
+    route = []
+    for index, (x, y, z) in enumerate(positions):
+        distance_jumped = 0.0 if index == 0 else sum((a - b) ** 2 for a, b in zip(positions[index - 1],
+                                                                                    (x, y, z))) ** .5
+        distance_left = sum((a - b) ** 2 for a, b in zip(end, (x, y, z))) ** .5
+        neutron = rng.random() < .5
+
+        if route_type == "simple":
+            route.append({"system": f"Synthetic {index}", "distance_jumped": distance_jumped,
+                          "distance_left": distance_left, "jumps": 0 if index == 0 else rng.randint(1, 4),
+                          "neutron_star": neutron, "x": x, "y": y, "z": z, "id64": index})
+        else:
+            route.append({"name": f"Synthetic {index}", "distance": distance_jumped,
+                          "distance_to_destination": distance_left, "fuel_in_tank": 32.0, "fuel_used": 0.0,
+                          "must_refuel": False, "has_neutron": neutron, "is_scoopable": not neutron,
+                          "x": x, "y": y, "z": z, "id64": index})
+
+    return route
+
+
+def measure(name: str, params: dict, function, operations: int, repeat: int = 1) -> dict:
+    """Time function and measure its peak memory in a separate run, tracing allocations slows it down"""
+
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(durations)
+    return {"name": name, "params": params, "operations": operations, "seconds": seconds,
+            "ops_per_second": operations / seconds if seconds else float("inf"), "peak_memory_bytes": peak_memory}
+
+
+def benchmark_journal(event_count: int, repeat: int, temp_dir: str) -> list:
+    lines = generate_journal_lines(event_count)
+    journal_dir = os.path.join(temp_dir, f"journal-{event_count}")
+    os.makedirs(journal_dir)
+    write_journal(journal_dir, lines)
+
+    params = {"events": event_count}
+    results = []
+
+    # parse_game_log reads the directory of the game, redirected to the synthetic journal
+    original_get_game_log_directory = utils.get_game_log_directory
+    utils.get_game_log_directory = lambda *args, **kwargs: journal_dir
+    try:
+        results.append(measure("parse_game_log", params, lambda: utils.parse_game_log(log_function=lambda *a: None),
+                               event_count, repeat))
+    finally:
+        utils.get_game_log_directory = original_get_game_log_directory
+
+    entries = [json.loads(line) for line in lines]
+    silent = {"log_function": lambda *args: None}
+    scanners = [
+        ("get_current_system_from_log", lambda: utils.get_current_system_from_log(entries, **silent)),
+        ("get_commander_name_from_log", lambda: utils.get_commander_name_from_log(entries, **silent)),
+        ("get_latest_loadout_event_from_log", lambda: utils.get_latest_loadout_event_from_log(entries)),
+        ("get_approx_ship_range", lambda: utils.get_approx_ship_range(entries, **silent))
+    ]
+    for name, function in scanners:
+        results.append(measure(name, params, function, event_count, repeat))
+
+    results.append(measure("JournalState.consume_lines", params, lambda: journal.JournalState().consume_lines(lines),
+                           event_count, repeat))
+
+    def tail_journal():
+        journal.JournalTailer(journal_dir).read_new_lines(log_function=lambda *args: None)
+
+    results.append(measure("JournalTailer.read_new_lines", params, tail_journal, event_count, repeat))
+
+    return results
+
+
+def benchmark_route(hop_count: int, route_type: str, repeat: int) -> list:
+    route = generate_route(hop_count, route_type)
+    params = {"hops": hop_count, "route_type": route_type}
+    results = [measure("RouteIndex", params, lambda: route_model.RouteIndex(route, route_type), hop_count, repeat)]
+
+    route_index = route_model.RouteIndex(route, route_type)
+
+    def follow_route():
+        # What the application loop does after every jump along the route
+        progress = -1
+        for system in route_index.systems[:-1]:
+            progress = route_index.find_progress_index(system, progress)
+            _ = route_index.next_hops[progress]
+
+    results.append(measure("route progress", params, follow_route, hop_count, repeat))
+
+    rejoin_engine = route_index.rejoin_engine
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, 100 * hop_count), rng.uniform(-100, 100), rng.uniform(-100, 100))
+                 for _ in range(100)]
+
+    def rejoin():
+        for position in positions:
+            rejoin_engine.find_rejoin_index(position)
+
+    results.append(measure("RejoinEngine.find_rejoin_index", params, rejoin, len(positions), repeat))
+
+    return results
+
+
+def benchmark_persistence(hop_count: int, repeat: int, temp_dir: str) -> list:
+    params = {"hops": hop_count}
+    results = []
+
+    config_path = os.path.join(temp_dir, f"config-{hop_count}")
+    config = configuration.Configuration(config_path, {"current_system": ""})
+    config["route"] = generate_route(hop_count, "simple")
+    config["route_type"] = "simple"
+
+    def write_config():
+        # A jump changes the hot values only, the route blob is written once
+        config["current_system"] = f"Synthetic {random.random()}"
+        config.save()
+
+    config.save()
+    results.append(measure("write_config", params, write_config, 1, repeat))
+    config.close()
+
+    return results
+
+
+def benchmark_logging(line_count: int, repeat: int, temp_dir: str) -> list:
+    log_dir = os.path.join(temp_dir, "logs")
+
+    def print_log():
+        writer = log_writer.LogWriter(log_dir)
+        for index in range(line_count):
+            writer.write(f"{time.strftime('%T')} Copied Synthetic {index} to clipboard")
+        writer.close()
+
+    return [measure("print_log", {"lines": line_count}, print_log, line_count, repeat)]
+
+
+def benchmark_planner(system_count: int, route_count: int, repeat: int) -> list:
+    """Plot routes between random systems of a synthetic galaxy with the local planner"""
+
+    planner = route_planner.NeutronPlanner(dataset=route_planner.generate_synthetic_galaxy(system_count))
+    rng = random.Random(0)
+    systems = [(planner.dataset.names[start_index], planner.dataset.names[end_index])
+               for start_index, end_index in (rng.sample(range(system_count), 2) for _ in range(route_count))]
+
+    def plot_routes():
+        for start_system, end_system in systems:
+            planner.plot_route(start_system, end_system, 50, log_function=lambda *args: None)
+
+    # The neutron star index is built once when the planner is first used
+    planner.get_neutron_index()
+    return [measure("NeutronPlanner.plot_route", {"systems": system_count}, plot_routes, route_count, repeat)]
+
+
+def compare_results(results: list, previous_results: list, threshold: float) -> list:
+    """Return the benchmarks that became slower than threshold compared to a previous run"""
+
+    previous = {(result["name"], json.dumps(result["params"], sort_keys=True)): result for result in previous_results}
+
+    regressions = []
+    for result in results:
+        previous_result = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if previous_result and result["ops_per_second"] < previous_result["ops_per_second"] / threshold:
+            regressions.append((result, previous_result))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the journal, route and persistence hot paths and the local "
+                                                 "route planner")
+    parser.add_argument("--journal-events", default="10000,100000",
+                        help="comma separated journal sizes in events, up to 1000000")
+    parser.add_argument("--route-hops", default="100,1000,10000", help="comma separated route lengths, up to 50000")
+    parser.add_argument("--log-lines", type=int, default=10000, help="lines written by the logging benchmark")
+    parser.add_argument("--planner-systems", default="100000",
+                        help="comma separated sizes of the synthetic galaxies the local planner plots routes in")
+    parser.add_argument("--planner-routes", type=int, default=10, help="routes plotted per galaxy")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest is reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="file the results are saved to")
+    parser.add_argument("--compare", default="", help="results of a previous run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="slowdown factor compared to the previous run that counts as regression")
+    args = parser.parse_args()
+
+    journal_sizes = [int(size) for size in args.journal_events.split(",") if size]
+    route_sizes = [int(size) for size in args.route_hops.split(",") if size]
+    galaxy_sizes = [int(size) for size in args.planner_systems.split(",") if size]
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for event_count in journal_sizes:
+            results += benchmark_journal(event_count, args.repeat, temp_dir)
+        for hop_count in route_sizes:
+            for route_type in ("simple", "exact"):
+                results += benchmark_route(hop_count, route_type, args.repeat)
+            results += benchmark_persistence(hop_count, args.repeat, temp_dir)
+        results += benchmark_logging(args.log_lines, args.repeat, temp_dir)
+        for system_count in galaxy_sizes:
+            results += benchmark_planner(system_count, args.planner_routes, args.repeat)
+
+    for result in results:
+        print(f"{result['name']:<36} {json.dumps(result['params']):<42} {result['ops_per_second']:>14.0f} ops/s "
+              f"{result['peak_memory_bytes'] / 1024 / 1024:>9.2f} MiB")
+
+    with open(args.output, "w") as f:
+        json.dump({"version": __version__, "python": platform.python_version(), "platform": platform.platform(),
+                   "timestamp": get_timestamp(time.time()), "results": results}, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare_results(results, json.load(f)["results"], args.threshold)
+
+        for result, previous_result in regressions:
+            print(f"REGRESSION {result['name']} {json.dumps(result['params'])}: "
+                  f"{previous_result['ops_per_second']:.0f} -> {result['ops_per_second']:.0f} ops/s")
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
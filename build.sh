@@ -5,7 +5,7 @@ build_all() {
   echo "" > "build.log"
 
   echo "Building standalone exe"
-  pyinstaller --noconfirm --windowed --onefile --icon "logo.ico" --add-data "logo.ico;." --add-data "themes;themes/" "EDNeutronAssistant.py" || exit 1
+  pyinstaller --noconfirm --windowed --onefile --icon "logo.ico" --add-data "logo.ico;." --add-data "themes;themes/" --add-data "data;data/" "EDNeutronAssistant.py" || exit 1
 
   echo "Building windows installer"
   python setup.py bdist_msi || exit 2
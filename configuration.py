@@ -0,0 +1,239 @@
+import os
+import copy
+import json
+import tempfile
+import threading
+from collections.abc import MutableMapping
+
+# Large values that are saved in their own files and only loaded when they are used
+COLD_KEYS = ("route", "ship_coriolis_build")
+
+
+def write_file_atomic(filename: str, content):
+    """Write a file by writing a temporary file first and renaming it, so a crash can not leave a truncated file.
+    Content is written in binary mode if it is bytes"""
+
+    file_descriptor, temp_filename = tempfile.mkstemp(dir=os.path.dirname(filename), prefix=".tmp-")
+    try:
+        with os.fdopen(file_descriptor, "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+    except OSError:
+        if os.path.isfile(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+
+class Configuration(MutableMapping):
+    """Application configuration. Small, frequently changing values are saved in data.json, large values like routes
+    and ship builds are saved in separate files that data.json references and are only read and written when needed.
+
+    Changes are saved by a background thread at most once every save_interval seconds, call close() to save pending
+    changes on exit. Values of missing or broken files are replaced by their defaults"""
+
+    def __init__(self, config_path: str, defaults: dict, save_interval: float = 2, log_function=print):
+        self.config_path = config_path
+        self.defaults = defaults
+        self.log_function = log_function
+        self.data_file = os.path.join(config_path, "data.json")
+        self.blobs_dir = os.path.join(config_path, "blobs")
+        self.save_interval = save_interval
+
+        self.hot_values = {}
+        self.cold_values = {}
+
+        # Cold keys that are saved in a file, mapped to their file name
+        self.blob_references = {}
+
+        self.hot_values_dirty = False
+        self.dirty_blobs = set()
+        self.deleted_blobs = set()
+
+        self.lock = threading.RLock()
+        # Only one thread writes files at a time
+        self.save_lock = threading.Lock()
+
+        self.save_requested = threading.Event()
+        self.closed = threading.Event()
+        self.writer_thread = None
+
+        self.update(defaults)
+
+    def load(self):
+        """Read data.json, values of old configuration files that contain routes and builds are moved to their own
+        files on the next save"""
+
+        try:
+            with open(self.data_file, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("configuration is not a JSON object")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            # A broken file is replaced with the defaults on the next save
+            self.log_function(f"Could not load configuration from {self.data_file}, using the defaults: {e}")
+            with self.lock:
+                self.hot_values_dirty = True
+            return
+
+        with self.lock:
+            # Saved cold values replace the defaults
+            for key in data.get("blob_references", {}):
+                self.cold_values.pop(key, None)
+                self.dirty_blobs.discard(key)
+            self.blob_references.update(data.pop("blob_references", {}))
+
+            for key, value in data.items():
+                self[key] = value
+
+    def get_blob_filename(self, key: str) -> str:
+        return os.path.join(self.blobs_dir, self.blob_references[key])
+
+    def __getitem__(self, key):
+        if key not in COLD_KEYS:
+            return self.hot_values[key]
+
+        with self.lock:
+            if key not in self.cold_values:
+                if key not in self.blob_references:
+                    raise KeyError(key)
+                try:
+                    with open(self.get_blob_filename(key), "r") as f:
+                        self.cold_values[key] = json.load(f)
+                except (OSError, ValueError) as e:
+                    self.log_function(f"Could not load {key} from {self.blob_references[key]}, using the default: "
+                                      f"{e}")
+                    del self.blob_references[key]
+                    self.hot_values_dirty = True
+                    if key not in self.defaults:
+                        raise KeyError(key)
+                    self[key] = copy.deepcopy(self.defaults[key])
+
+            return self.cold_values[key]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            if key not in COLD_KEYS:
+                if key not in self.hot_values or self.hot_values[key] != value:
+                    self.hot_values[key] = value
+                    self.hot_values_dirty = True
+                return
+
+            self.cold_values[key] = value
+            if key not in self.blob_references:
+                self.blob_references[key] = f"{key}.json"
+                self.hot_values_dirty = True
+            self.dirty_blobs.add(key)
+            self.deleted_blobs.discard(self.get_blob_filename(key))
+
+    def __delitem__(self, key):
+        with self.lock:
+            if key not in COLD_KEYS:
+                del self.hot_values[key]
+                self.hot_values_dirty = True
+                return
+
+            if key not in self.blob_references:
+                raise KeyError(key)
+            self.cold_values.pop(key, None)
+            self.dirty_blobs.discard(key)
+            self.deleted_blobs.add(self.get_blob_filename(key))
+            del self.blob_references[key]
+            self.hot_values_dirty = True
+
+    def __contains__(self, key):
+        # Avoids loading cold values
+        return key in self.hot_values or key in self.blob_references
+
+    def __iter__(self):
+        yield from list(self.hot_values)
+        yield from list(self.blob_references)
+
+    def __len__(self):
+        return len(self.hot_values) + len(self.blob_references)
+
+    @property
+    def dirty(self) -> bool:
+        return self.hot_values_dirty or bool(self.dirty_blobs) or bool(self.deleted_blobs)
+
+    def save(self):
+        """Write data.json and all cold values that changed since the last save"""
+
+        with self.save_lock:
+            # Take a snapshot so other threads are not blocked while serializing and writing. Values are replaced,
+            # not changed in place, so the snapshot only copies the containers
+            with self.lock:
+                if not self.dirty:
+                    return
+                hot_values = {**self.hot_values, "blob_references": dict(self.blob_references)}
+                cold_values = {self.get_blob_filename(key): self.cold_values[key] for key in self.dirty_blobs}
+                dirty_blobs = set(self.dirty_blobs)
+                deleted_blobs = set(self.deleted_blobs)
+
+                self.hot_values_dirty = False
+                self.dirty_blobs.clear()
+                self.deleted_blobs.clear()
+
+            try:
+                data = json.dumps(hot_values, indent=2)
+                blobs = {filename: json.dumps(value) for filename, value in cold_values.items()}
+
+                if blobs and not os.path.isdir(self.blobs_dir):
+                    os.makedirs(self.blobs_dir)
+
+                for filename, content in blobs.items():
+                    write_file_atomic(filename, content)
+
+                # Blobs have to be written before data.json references them
+                write_file_atomic(self.data_file, data)
+
+                for filename in deleted_blobs:
+                    if os.path.isfile(filename):
+                        os.remove(filename)
+
+            except OSError:
+                # Try again on the next save
+                with self.lock:
+                    self.hot_values_dirty = True
+                    self.dirty_blobs.update(key for key in dirty_blobs if key in self.blob_references)
+                    self.deleted_blobs.update(deleted_blobs)
+                raise
+
+    def request_save(self):
+        """Save the configuration in the background, all requests within save_interval are written at once"""
+
+        if self.closed.is_set():
+            self.save()
+            return
+
+        with self.lock:
+            if self.writer_thread is None:
+                self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+                self.writer_thread.start()
+
+        self.save_requested.set()
+
+    def writer_loop(self):
+        while not self.closed.is_set():
+            self.save_requested.wait()
+
+            # Collect all changes made during the interval, returns early when closing
+            self.closed.wait(self.save_interval)
+
+            self.save_requested.clear()
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop the background writer and save pending changes"""
+
+        self.closed.set()
+        self.save_requested.set()
+        if self.writer_thread is not None:
+            self.writer_thread.join()
+        self.save()
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+
+def get_distance(coordinates1: dict, coordinates2: dict) -> float:
+    """Calculate the distance between two coordinates"""
+    return round(((coordinates2["x"] - coordinates1["x"]) ** 2 + (coordinates2["y"] - coordinates1["y"]) ** 2 +
+                  (coordinates2["z"] - coordinates1["z"]) ** 2) ** (1 / 2), 2)
+
+
+def get_route_coordinates(route: list) -> list:
+    """Return (system name, coordinates) tuples of all systems of a simple or exact route"""
+
+    route_coordinates = []
+    for route_entry in route:
+        name = route_entry.get("system", route_entry.get("name"))
+        if name and "x" in route_entry:
+            route_coordinates.append((name, {"x": route_entry["x"], "y": route_entry["y"], "z": route_entry["z"]}))
+
+    return route_coordinates
+
+
+def read_journal_coordinates(filename: str) -> list:
+    """Return (system name, coordinates) tuples of all StarPos entries of a journal file. Files that can not be read
+    are skipped, undecodable bytes only make their line invalid"""
+
+    journal_coordinates = []
+    try:
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                # Only decode lines that can contain coordinates
+                if '"StarPos"' not in line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    x, y, z = entry["StarPos"]
+                    system = entry["StarSystem"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                journal_coordinates.append((system, {"x": x, "y": y, "z": z}))
+    except OSError:
+        return []
+
+    return journal_coordinates
+
+
+class LRUCache(OrderedDict):
+    """Dictionary that drops the least recently used entries when it exceeds max_size"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class CoordinateStore:
+    """Persistent store of system coordinates in the configuration directory, with an in memory cache in front of it.
+    The store is limited to max_entries systems, least recently used systems are removed first. Access times are
+    saved in batches of access_batch_size systems"""
+
+    def __init__(self, config_path: str, max_entries: int = 500000, memory_entries: int = 4096,
+                 access_batch_size: int = 256):
+        self.max_entries = max_entries
+        self.access_batch_size = access_batch_size
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(config_path, "coordinates.db"), check_same_thread=False)
+
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS systems (name TEXT PRIMARY KEY, display_name TEXT, "
+                                    "x REAL, y REAL, z REAL, last_access REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS systems_last_access ON systems (last_access)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        self.entry_count = self.connection.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+
+        self.coordinates_cache = LRUCache(memory_entries)
+
+        # Key -> time of the last access, not saved yet
+        self.pending_accesses = {}
+
+        # Set by close, the store can still be used by threads that are not stopped yet but does not do anything
+        self.closed = False
+
+    @staticmethod
+    def get_key(system: str) -> str:
+        """System names are case insensitive"""
+        return system.strip().lower()
+
+    def get(self, system: str) -> dict:
+        """Return the coordinates of a system, None if they are not known"""
+
+        key = self.get_key(system)
+
+        with self.lock:
+            if self.closed:
+                return None
+
+            coordinates = self.coordinates_cache.get(key)
+            if not coordinates:
+                row = self.connection.execute("SELECT x, y, z FROM systems WHERE name = ?", (key,)).fetchone()
+                if not row:
+                    return None
+
+                coordinates = {"x": row[0], "y": row[1], "z": row[2]}
+                self.coordinates_cache.put(key, coordinates)
+
+            self.pending_accesses[key] = time.time()
+            if len(self.pending_accesses) >= self.access_batch_size:
+                with self.connection:
+                    self.save_accesses()
+
+        return coordinates
+
+    def save_accesses(self):
+        """Write the pending access times, has to be called with the lock held inside a transaction"""
+
+        self.connection.executemany("UPDATE systems SET last_access = ? WHERE name = ?",
+                                    [(access_time, key) for key, access_time in self.pending_accesses.items()])
+        self.pending_accesses.clear()
+
+    def put(self, system: str, coordinates: dict):
+        """Save the coordinates of a system"""
+        self.put_many([(system, coordinates)])
+
+    def put_many(self, systems: list):
+        """Save the coordinates of multiple systems, given as a list of (system name, coordinates) tuples"""
+
+        now = time.time()
+
+        with self.lock:
+            if self.closed:
+                return
+
+            rows = []
+            for system, coordinates in systems:
+                key = self.get_key(system)
+                # Skip systems that are already known to avoid unnecessary writes
+                if self.coordinates_cache.get(key) == coordinates:
+                    continue
+                rows.append((key, system, coordinates["x"], coordinates["y"], coordinates["z"], now))
+
+            if not rows:
+                return
+
+            with self.connection:
+                self.save_accesses()
+                self.connection.executemany("INSERT OR REPLACE INTO systems VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+            for row in rows:
+                self.coordinates_cache.put(row[0], {"x": row[2], "y": row[3], "z": row[4]})
+
+            # Replaced systems are counted too, the exact count is only needed when the limit seems to be exceeded
+            self.entry_count += len(rows)
+            if self.entry_count > self.max_entries:
+                self.entry_count = self.connection.execute("SELECT COUNT(*) FROM systems").fetchone()[0]
+                if self.entry_count > self.max_entries:
+                    self.evict()
+
+    def evict(self):
+        """Remove the least recently used systems until the store is 10% below its size limit"""
+
+        remove_count = self.entry_count - int(self.max_entries * .9)
+
+        with self.connection:
+            self.connection.execute("DELETE FROM systems WHERE name IN (SELECT name FROM systems ORDER BY last_access "
+                                    "LIMIT ?)", (remove_count,))
+
+        self.entry_count -= remove_count
+        self.coordinates_cache.clear()
+
+    def get_all_names(self) -> list:
+        """Return the names of all systems in the store"""
+        with self.lock:
+            if self.closed:
+                return []
+            return [row[0] for row in self.connection.execute("SELECT display_name FROM systems")]
+
+    def get_meta(self, key: str) -> str:
+        with self.lock:
+            if self.closed:
+                return ""
+            row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else ""
+
+    def set_meta(self, key: str, value: str):
+        with self.lock:
+            if self.closed:
+                return
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def backfill_from_journals(self, file_directory: str, log_function=print, verbose=False, max_workers=None):
+        """Add the coordinates of all systems in the journal files of a directory, only done once. The journal files
+        are read in parallel by a process pool"""
+
+        if self.get_meta("journal_backfill") == "done" or not os.path.isdir(file_directory):
+            return
+
+        journal_files = [os.path.join(file_directory, file) for file in os.listdir(file_directory)
+                         if file.startswith("Journal")]
+
+        log_function(f"Reading system coordinates from {len(journal_files)} journal files")
+
+        system_count = 0
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for filename, journal_coordinates in zip(journal_files,
+                                                     executor.map(read_journal_coordinates, journal_files)):
+                if verbose:
+                    log_function(f"Found {len(journal_coordinates)} coordinates in {filename}")
+                self.put_many(journal_coordinates)
+                system_count += len(journal_coordinates)
+
+        self.set_meta("journal_backfill", "done")
+
+        log_function(f"Saved coordinates of {system_count} visited systems")
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+
+            with self.connection:
+                self.save_accesses()
+            self.connection.close()
@@ -10,6 +10,7 @@ except ImportError:
 
 import autocomplete
 import api_access
+import menu
 
 
 class StatusInformation(ttk.Frame):
@@ -174,19 +175,23 @@ class SimpleRouteSelection(ttk.Frame):
             self.master.change_state_of_all_calculate_buttons("normal")
             return
 
+        # Routes are plotted locally instead of by Spansh if selected in the settings
+        planner = self.master.tracker.route_planner if menu.USER_SETTINGS["route_backend"] == menu.LOCAL_BACKEND \
+            else None
+
         route_systems = api_access.calc_simple_neutron_route(efficiency, jump_range, from_system, to_system,
-                                                             self.master.config_path,
+                                                             self.master.tracker.route_cache, planner=planner,
                                                              log_function=self.master.print_log)
 
         self.master.change_state_of_all_calculate_buttons("normal")
 
+        if self.master.tracker.verbose:
+            self.master.print_log(f"Route cache statistics: {self.master.tracker.route_cache.stats()}")
+
         if len(route_systems) == 0:
             return
 
-        self.master.print_log(f"Loaded route of {len(route_systems)} systems")
-        self.master.configuration["route"] = route_systems
-        self.master.configuration["route_type"] = "simple"
-        self.master.write_config()
+        self.master.tracker.load_route(route_systems, "simple")
 
     def on_calculate_button(self):
         threading.Thread(target=self.calculate_thread).start()
@@ -276,7 +281,7 @@ class ExactRouteSelection(ttk.Frame):
         use_injections = True if self.use_injections_var.get() else False
         exclude_secondary = True if self.exclude_secondary_var.get() else False
 
-        ship_build = self.master.configuration["ship_coriolis_build"]
+        ship_build = self.master.tracker.configuration["ship_coriolis_build"]
 
         try:
             cargo = int(cargo)
@@ -292,18 +297,19 @@ class ExactRouteSelection(ttk.Frame):
 
         route_systems = api_access.calc_exact_neutron_route(from_system, to_system, ship_build, cargo,
                                                             already_supercharged, use_supercharge, use_injections,
-                                                            exclude_secondary, config_path=self.master.config_path,
+                                                            exclude_secondary, cache=self.master.tracker.route_cache,
+                                                            modules=self.master.tracker.module_data,
                                                             log_function=self.master.print_log)
 
         self.master.change_state_of_all_calculate_buttons("normal")
 
+        if self.master.tracker.verbose:
+            self.master.print_log(f"Route cache statistics: {self.master.tracker.route_cache.stats()}")
+
         if len(route_systems) == 0:
             return
 
-        self.master.print_log(f"Loaded route of {len(route_systems)} systems")
-        self.master.configuration["route"] = route_systems
-        self.master.configuration["route_type"] = "exact"
-        self.master.write_config()
+        self.master.tracker.load_route(route_systems, "exact")
 
     def on_calculate_button(self):
         threading.Thread(target=self.calculate_thread).start()
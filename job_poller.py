@@ -0,0 +1,174 @@
+import time
+import json
+import heapq
+import random
+import threading
+import concurrent.futures
+
+
+class SpanshJobError(Exception):
+    """Raised through the future of a job that failed, timed out or could not be polled"""
+
+
+class SpanshJobPoller:
+    """Polls the results of any number of Spansh jobs on a single background thread. Each job is polled with an
+    exponentially growing, jittered delay, Retry-After headers of throttled responses are honoured. Completed jobs
+    are delivered through concurrent.futures.Future objects"""
+
+    def __init__(self, results_url: str, headers: dict = None, initial_delay: float = .5, max_delay: float = 15,
+                 backoff_factor: float = 1.5, jitter: float = .2, max_errors: int = 5):
+        self.results_url = results_url
+        self.headers = headers
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.max_errors = max_errors
+
+        # Heap of (next poll time, job id)
+        self.schedule = []
+        # job id -> job state
+        self.jobs = {}
+
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def submit(self, job_id: str, timeout: float = None, callback=None) -> concurrent.futures.Future:
+        """Start polling a job, the future resolves to the response of the completed job. If given, callback is
+        called with the future once the job is done. Submitting a job that is already polled returns its future"""
+
+        now = time.monotonic()
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job:
+                if callback:
+                    job["future"].add_done_callback(callback)
+                return job["future"]
+
+            future = concurrent.futures.Future()
+            if callback:
+                future.add_done_callback(callback)
+
+            self.jobs[job_id] = {"future": future, "delay": self.initial_delay, "errors": 0,
+                                 "deadline": now + timeout if timeout else None}
+            heapq.heappush(self.schedule, (now + self.initial_delay, job_id))
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.worker_loop, daemon=True)
+                self.thread.start()
+
+            self.condition.notify()
+
+        return future
+
+    def cancel(self, job_id: str):
+        """Stop polling a job, its future is cancelled"""
+        with self.condition:
+            job = self.jobs.pop(job_id, None)
+        if job:
+            job["future"].cancel()
+
+    def cancel_all(self):
+        with self.condition:
+            job_ids = list(self.jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def get_next_delay(self, job: dict) -> float:
+        delay = job["delay"]
+        job["delay"] = min(delay * self.backoff_factor, self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def finish(self, job_id: str, result=None, exception: Exception = None):
+        with self.condition:
+            job = self.jobs.pop(job_id, None)
+        if not job or job["future"].done():
+            return
+        if exception:
+            job["future"].set_exception(exception)
+        else:
+            job["future"].set_result(result)
+
+    def poll(self, job_id: str, job: dict) -> float:
+        """Poll a job once, return the delay until the next poll or None if the job is done"""
+        import requests
+
+        if job["future"].cancelled():
+            self.finish(job_id)
+            return None
+
+        if job["deadline"] and time.monotonic() > job["deadline"]:
+            self.finish(job_id, exception=SpanshJobError(f"Job {job_id} timed out"))
+            return None
+
+        try:
+            response = requests.get(self.results_url + job_id, headers=self.headers, timeout=10)
+        except requests.RequestException as e:
+            response = None
+            error = str(e)
+
+        if response is not None and response.status_code in (429, 503):
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return max(float(retry_after), job["delay"])
+            return self.get_next_delay(job)
+
+        # Server errors are retried like failed connections, even if their body contains an error message
+        if response is not None and response.status_code >= 500:
+            error = f"Server error with status code {response.status_code}"
+        elif response is not None:
+            try:
+                response_dict = json.loads(response.text)
+            except ValueError:
+                error = f"Invalid response with status code {response.status_code}"
+            else:
+                if "error" in response_dict:
+                    self.finish(job_id, exception=SpanshJobError(response_dict["error"]))
+                    return None
+                if response_dict.get("status") == "ok":
+                    self.finish(job_id, result=response_dict)
+                    return None
+                # Job is still queued or running
+                job["errors"] = 0
+                return self.get_next_delay(job)
+
+        job["errors"] += 1
+        if job["errors"] >= self.max_errors:
+            self.finish(job_id, exception=SpanshJobError(error))
+            return None
+
+        return self.get_next_delay(job)
+
+    def worker_loop(self):
+        while 1:
+            with self.condition:
+                while 1:
+                    # Drop jobs that were cancelled in the meantime
+                    while self.schedule and self.schedule[0][1] not in self.jobs:
+                        heapq.heappop(self.schedule)
+
+                    if not self.schedule:
+                        self.condition.wait()
+                        continue
+
+                    next_poll_time, job_id = self.schedule[0]
+                    wait_time = next_poll_time - time.monotonic()
+                    if wait_time <= 0:
+                        heapq.heappop(self.schedule)
+                        job = self.jobs[job_id]
+                        break
+
+                    # Woken up early when a new job is submitted
+                    self.condition.wait(wait_time)
+
+            # The worker has to keep running for all other jobs, an unexpected error only fails this job
+            try:
+                delay = self.poll(job_id, job)
+            except Exception as e:
+                self.finish(job_id, exception=SpanshJobError(f"Polling job {job_id} failed: {e}"))
+                delay = None
+
+            if delay is not None:
+                with self.condition:
+                    if job_id in self.jobs:
+                        heapq.heappush(self.schedule, (time.monotonic() + delay, job_id))
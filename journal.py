@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+import utils
+
+# inotify event flags, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+
+# Journal events that contain information used by the application, all other events are skipped without decoding them
+SYSTEM_EVENTS = {"Location", "FSDJump", "CarrierJump", "StartJump", "SupercruiseEntry", "SupercruiseExit", "Docked",
+                 "ApproachBody", "LeaveBody", "Touchdown", "Liftoff"}
+COMMANDER_EVENTS = {"Commander", "LoadGame"}
+STAR_POS_EVENTS = {"Location", "FSDJump", "CarrierJump"}
+RELEVANT_EVENTS = SYSTEM_EVENTS | COMMANDER_EVENTS | {"Loadout"}
+
+EVENT_MARKER = '"event":"'
+
+
+class JournalTailer:
+    """Incrementally reads the newest Elite: Dangerous journal file, only parsing lines that were appended since the
+    last read"""
+
+    def __init__(self, file_directory: str = ""):
+        self.file_directory = file_directory
+
+        self.current_file = ""
+        self.inode = None
+        self.offset = 0
+        self.partial_line = b""
+
+        self.directory_mtime = None
+        self.directory_found = True
+
+        # True if the last read started reading a new journal file
+        self.rotated = False
+
+    def find_newest_journal(self) -> str:
+        """Return the path of the newest journal file, the directory is only listed again if it was modified"""
+
+        directory_mtime = os.stat(self.file_directory).st_mtime_ns
+
+        if self.current_file and directory_mtime == self.directory_mtime:
+            return self.current_file
+
+        self.directory_mtime = directory_mtime
+
+        journal_files = [os.path.join(self.file_directory, file) for file in os.listdir(self.file_directory)
+                         if file.startswith("Journal")]
+
+        if not journal_files:
+            return ""
+
+        return max(journal_files, key=os.path.getctime)
+
+    def switch_to_file(self, filename: str, inode, log_function=print, verbose=False):
+        """Start reading a journal file from the beginning"""
+
+        if verbose:
+            log_function(f"Reading log file {filename}")
+
+        self.current_file = filename
+        self.inode = inode
+        self.offset = 0
+        self.partial_line = b""
+        self.rotated = True
+
+    def read_new_lines(self, log_function=print, verbose=False) -> list:
+        """Return all complete lines that were appended to the newest journal since the last call"""
+
+        self.rotated = False
+
+        if not self.file_directory:
+            self.file_directory = utils.get_game_log_directory(log_function=log_function, verbose=verbose)
+            if not self.file_directory:
+                return []
+
+        if not os.path.isdir(self.file_directory):
+            # Only report missing logs once instead of every poll
+            if self.directory_found:
+                log_function("Game logs not found")
+                self.directory_found = False
+            return []
+        self.directory_found = True
+
+        newest_log_file = self.find_newest_journal()
+        if not newest_log_file:
+            return []
+
+        try:
+            file_stat = os.stat(newest_log_file)
+        except FileNotFoundError:
+            # Journal was removed between listing and reading, list the directory again on the next call
+            self.directory_mtime = None
+            return []
+
+        # Journal rotated, replaced or truncated
+        if newest_log_file != self.current_file or file_stat.st_ino != self.inode or file_stat.st_size < self.offset:
+            self.switch_to_file(newest_log_file, file_stat.st_ino, log_function=log_function, verbose=verbose)
+
+        if file_stat.st_size == self.offset:
+            return []
+
+        with open(newest_log_file, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(file_stat.st_size - self.offset)
+
+        self.offset += len(data)
+
+        # The last element is either empty or a line the game has not finished writing yet
+        lines = (self.partial_line + data).split(b"\n")
+        self.partial_line = lines.pop()
+
+        new_lines = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                new_lines.append(line.decode("utf-8"))
+
+        return new_lines
+
+    def read_new_entries(self, log_function=print, verbose=False) -> list:
+        """Return all journal entries that were appended to the newest journal since the last call"""
+
+        entries_parsed = []
+        for line in self.read_new_lines(log_function=log_function, verbose=verbose):
+            try:
+                entries_parsed.append(json.loads(line))
+            except json.JSONDecodeError:
+                log_function("Skipping invalid journal entry")
+
+        return entries_parsed
+
+
+class JournalState:
+    """Information about the game derived from journal lines, updated incrementally as new lines are consumed"""
+
+    def __init__(self, on_star_pos=None):
+        # Called with the system name and coordinates whenever a StarPos is found
+        self.on_star_pos = on_star_pos
+
+        self.reset()
+
+    def reset(self):
+        """Forget everything, used when a new journal file is started"""
+        self.commander_name = ""
+        self.current_system = ""
+        self.latest_loadout_event = None
+        self.jump_range = 0
+        self.star_pos = None
+        self.star_pos_system = ""
+
+    def consume_line(self, line: str):
+        """Update the state from a single journal line"""
+
+        # Cheap check of the event type to avoid decoding events like Music, ReceiveText or Scan
+        marker_index = line.find(EVENT_MARKER)
+        if marker_index != -1:
+            event_start = marker_index + len(EVENT_MARKER)
+            if line[event_start:line.find('"', event_start)] not in RELEVANT_EVENTS:
+                return
+
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+        event = entry.get("event")
+
+        if event == "Commander":
+            if not self.commander_name:
+                self.commander_name = entry["Name"]
+        elif "Commander" in entry:
+            if not self.commander_name:
+                self.commander_name = entry["Commander"]
+
+        if "StarSystem" in entry:
+            self.current_system = entry["StarSystem"]
+
+        if event in STAR_POS_EVENTS and "StarPos" in entry:
+            self.star_pos = entry["StarPos"]
+            self.star_pos_system = entry["StarSystem"]
+            if self.on_star_pos:
+                x, y, z = self.star_pos
+                self.on_star_pos(self.star_pos_system, {"x": x, "y": y, "z": z})
+
+        if event == "Loadout":
+            self.latest_loadout_event = entry
+            self.jump_range = round(.95 * float(entry["MaxJumpRange"]), 2)
+
+    def consume_lines(self, lines: list):
+        for line in lines:
+            self.consume_line(line)
+
+
+def load_inotify():
+    """Return the C library if it supports inotify, None otherwise"""
+
+    if not hasattr(select, "select") or not os.name == "posix":
+        return None
+
+    library_name = ctypes.util.find_library("c")
+    if not library_name:
+        return None
+
+    try:
+        libc = ctypes.CDLL(library_name, use_errno=True)
+        # Accessing the functions raises AttributeError if they are not available
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+
+    return libc
+
+
+class JournalWatcher:
+    """Blocks until the game writes to its journal directory. Uses inotify on Linux and falls back to polling every
+    poll_rate seconds on other systems or if inotify is not available"""
+
+    def __init__(self, poll_rate: float = 1, idle_timeout: float = 60):
+        self.poll_rate = poll_rate
+        # Safety net when watching with inotify, in case an event is missed
+        self.idle_timeout = idle_timeout
+
+        self.libc = load_inotify()
+        self.inotify_fd = None
+        self.watched_directory = ""
+
+        # Used to wake up a waiting thread, e.g. when a new route was loaded or the application exits
+        self.wake_event = threading.Event()
+        self.wake_read_fd, self.wake_write_fd = os.pipe() if self.libc else (None, None)
+
+    @property
+    def using_inotify(self) -> bool:
+        return self.inotify_fd is not None
+
+    def watch(self, file_directory: str, log_function=print, verbose=False) -> bool:
+        """Set up an inotify watch for the journal directory, keeps polling if that is not possible. Return True if a
+        new watch was set up"""
+
+        if not self.libc or file_directory == self.watched_directory or not os.path.isdir(file_directory):
+            return False
+
+        self.close()
+
+        inotify_fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if inotify_fd < 0:
+            log_function(f"Could not initialize inotify ({os.strerror(ctypes.get_errno())}), polling game logs")
+            self.libc = None
+            return False
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+        if self.libc.inotify_add_watch(inotify_fd, os.fsencode(file_directory), mask) < 0:
+            log_function(f"Could not watch game logs ({os.strerror(ctypes.get_errno())}), polling game logs")
+            os.close(inotify_fd)
+            self.libc = None
+            return False
+
+        self.inotify_fd = inotify_fd
+        self.watched_directory = file_directory
+
+        if verbose:
+            log_function(f"Watching {file_directory} for journal changes")
+
+        return True
+
+    def read_inotify_events(self) -> bool:
+        """Drain pending inotify events, return True if any of them concerns a journal file"""
+
+        journal_changed = False
+
+        while 1:
+            try:
+                buffer = os.read(self.inotify_fd, 4096)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+                offset += INOTIFY_EVENT_HEADER.size
+                name = buffer[offset:offset + name_length].rstrip(b"\0")
+                offset += name_length
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    # Directory is gone, fall back to polling until it can be watched again
+                    self.close()
+                    return True
+
+                if name.startswith(b"Journal"):
+                    journal_changed = True
+
+        return journal_changed
+
+    def wait(self, file_directory: str, log_function=print, verbose=False):
+        """Block until a journal file changed, wake() was called or the timeout ran out"""
+
+        # Changes that happened before the watch was set up would otherwise go unnoticed
+        if self.watch(file_directory, log_function=log_function, verbose=verbose):
+            return
+
+        if not self.using_inotify:
+            self.wake_event.wait(self.poll_rate)
+            self.wake_event.clear()
+            return
+
+        deadline = time.monotonic() + self.idle_timeout
+        while 1:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+
+            readable, _, _ = select.select([self.inotify_fd, self.wake_read_fd], [], [], timeout)
+
+            if self.wake_read_fd in readable:
+                os.read(self.wake_read_fd, 4096)
+                return
+
+            # Other files in the directory like Status.json change constantly while playing and are ignored
+            if self.inotify_fd in readable and self.read_inotify_events():
+                return
+
+    def wake(self):
+        """Wake up a thread that is currently waiting"""
+        self.wake_event.set()
+        if self.wake_write_fd is not None:
+            os.write(self.wake_write_fd, b"\0")
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+        self.inotify_fd = None
+        self.watched_directory = ""
@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Jump range multiplier of a ship that was supercharged at a neutron star or white dwarf
+NEUTRON_SUPERCHARGE = 4.0
+WHITE_DWARF_SUPERCHARGE = 1.5
+
+# Values of the exact route payload that define how far a ship can jump. base_mass includes the reserve tank
+FsdParameters = namedtuple("FsdParameters", ["optimal_mass", "fuel_power", "fuel_multiplier", "max_fuel_per_jump",
+                                             "range_boost", "base_mass", "tank_size", "internal_tank_size"])
+
+
+def get_fsd_parameters(payload: dict) -> FsdParameters:
+    """Take the FSD parameters from an exact route payload"""
+    return FsdParameters(float(payload["optimal_mass"]), float(payload["fuel_power"]),
+                         float(payload["fuel_multiplier"]), float(payload["max_fuel_per_jump"]),
+                         float(payload["range_boost"]), float(payload["base_mass"]), float(payload["tank_size"]),
+                         float(payload["internal_tank_size"]))
+
+
+def get_jump_range(fsd: FsdParameters, fuel=None, cargo=0, supercharge=1.0) -> np.ndarray:
+    """Jump range with the given fuel in the main tank and cargo, by default with a full tank and no cargo. All
+    arguments can be arrays and are broadcast against each other"""
+
+    fuel = np.asarray(fsd.tank_size if fuel is None else fuel, dtype=np.float64)
+    mass = fsd.base_mass + fuel + np.asarray(cargo, dtype=np.float64)
+
+    fuel_per_jump = np.minimum(fuel, fsd.max_fuel_per_jump)
+    base_range = fsd.optimal_mass / mass * (fuel_per_jump / fsd.fuel_multiplier) ** (1 / fsd.fuel_power)
+
+    return (base_range + fsd.range_boost) * np.asarray(supercharge, dtype=np.float64)
+
+
+def get_fuel_cost(fsd: FsdParameters, distance, fuel=None, cargo=0, supercharge=1.0) -> np.ndarray:
+    """Fuel used to jump distance with the given fuel in the main tank at departure. Jumps that are out of range
+    cost more than max_fuel_per_jump"""
+
+    fuel = np.asarray(fsd.tank_size if fuel is None else fuel, dtype=np.float64)
+    mass = fsd.base_mass + fuel + np.asarray(cargo, dtype=np.float64)
+
+    # The booster adds a fixed distance, supercharging multiplies the boosted range
+    effective_distance = np.maximum(np.asarray(distance, dtype=np.float64) / np.asarray(supercharge, dtype=np.float64)
+                                    - fsd.range_boost, 0.0)
+
+    return fsd.fuel_multiplier * (effective_distance * mass / fsd.optimal_mass) ** fsd.fuel_power
+
+
+def get_route_fuel(fsd: FsdParameters, distances, supercharges=1.0, refuels=False, cargo=0, start_fuel=None,
+                   tolerance: float = 1e-6) -> (np.ndarray, np.ndarray):
+    """Simulate the fuel along a route. distances[i] is the jump that arrives at system i, supercharges[i] the
+    multiplier of that jump and refuels[i] whether the tank is filled at system i before jumping on. Returns the fuel
+    in the main tank on arrival at each system and the fuel used by each jump.
+
+    The fuel cost depends on the mass and so on the fuel left, the costs of all jumps are estimated together and
+    refined until no cost changes by more than tolerance. Every refinement makes at least one more jump exact, so
+    there are at most as many refinements as jumps"""
+
+    distances = np.asarray(distances, dtype=np.float64)
+    supercharges = np.broadcast_to(np.asarray(supercharges, dtype=np.float64), distances.shape)
+    refuels = np.broadcast_to(np.asarray(refuels, dtype=bool), distances.shape).copy()
+
+    count = len(distances)
+    start_fuel = fsd.tank_size if start_fuel is None else start_fuel
+
+    # The tank is "refilled" to start_fuel at the first system
+    refuels[0] = True
+    segment_starts = np.maximum.accumulate(np.where(refuels, np.arange(count), 0))
+    segment_fuel = np.where(segment_starts == 0, start_fuel, fsd.tank_size)
+
+    fuel_used = np.zeros(count)
+    departure_fuel = np.full(count, float(start_fuel))
+    arrival_fuel = np.full(count, float(start_fuel))
+    for _ in range(count):
+        previous_fuel_used = fuel_used.copy()
+        fuel_used[1:] = get_fuel_cost(fsd, distances[1:], departure_fuel[:-1], cargo, supercharges[1:])
+
+        # Fuel used since the tank was last filled at or before the previous system
+        used_total = np.cumsum(fuel_used)
+        arrival_fuel[1:] = segment_fuel[:-1] - (used_total[1:] - used_total[segment_starts[:-1]])
+
+        departure_fuel = np.where(refuels, segment_fuel, arrival_fuel)
+
+        if np.max(np.abs(fuel_used - previous_fuel_used)) < tolerance:
+            break
+
+    return arrival_fuel, fuel_used
+
+
+def get_fuel_warnings(fsd: FsdParameters, arrival_fuel: np.ndarray, fuel_used: np.ndarray,
+                      reserve_jumps: float = 1.0) -> np.ndarray:
+    """Return the indices of systems the ship arrives at with less fuel than reserve_jumps maximum jumps or after a
+    jump it could not make"""
+
+    low_fuel = arrival_fuel < reserve_jumps * fsd.max_fuel_per_jump
+    impossible_jump = fuel_used > fsd.max_fuel_per_jump + 1e-9
+    return np.flatnonzero(low_fuel | impossible_jump)
@@ -0,0 +1,148 @@
+import os
+import time
+import gzip
+import queue
+import shutil
+import threading
+
+LOG_FILE_PREFIX = "EDNeutronAssistant-"
+
+
+class LogWriter:
+    """Writes log lines to a daily log file in a background thread, so logging never waits for the disk. The file is
+    kept open and flushed every flush_interval seconds. Logs of previous days and logs that reached max_file_size bytes
+    are compressed and the oldest compressed logs are deleted once all logs exceed max_total_size bytes"""
+
+    def __init__(self, logs_dir: str, flush_interval: float = 1, max_file_size: int = 10 * 1024 * 1024,
+                 max_total_size: int = 50 * 1024 * 1024):
+        self.logs_dir = logs_dir
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+
+        self.queue = queue.Queue()
+        self.file = None
+        self.file_date = ""
+        # Bytes in the open log file
+        self.file_size = 0
+
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def write(self, line: str):
+        """Queue a line to be written to the log file"""
+        self.queue.put(line)
+
+    def open_log_file(self, date: str):
+        """Open the log file of a day, older log files are compressed"""
+
+        if self.file:
+            self.file.close()
+            self.file = None
+
+        if not os.path.isdir(self.logs_dir):
+            os.makedirs(self.logs_dir)
+
+        # A full log file is renamed and compressed along with the logs of previous days
+        filename = os.path.join(self.logs_dir, f"{LOG_FILE_PREFIX}{date}.log")
+        if os.path.isfile(filename) and os.path.getsize(filename) >= self.max_file_size:
+            os.replace(filename, self.get_rotated_filename(date))
+
+        self.file_date = date
+        self.file = open(filename, "a", encoding="utf-8")
+        self.file_size = os.path.getsize(filename)
+
+        self.rotate_logs()
+
+    def get_rotated_filename(self, date: str) -> str:
+        """Name for a full log file of a day that is not used by a log or compressed log yet"""
+
+        index = 0
+        while 1:
+            filename = os.path.join(self.logs_dir, f"{LOG_FILE_PREFIX}{date}.{time.strftime('%H%M%S')}.{index}.log")
+            if not os.path.exists(filename) and not os.path.exists(filename + ".gz"):
+                return filename
+            index += 1
+
+    def rotate_logs(self):
+        """Compress the logs of previous days and delete the oldest logs if they exceed the size limit"""
+
+        current_log = f"{LOG_FILE_PREFIX}{self.file_date}.log"
+
+        for file in os.listdir(self.logs_dir):
+            if file.startswith(LOG_FILE_PREFIX) and file.endswith(".log") and file != current_log:
+                filename = os.path.join(self.logs_dir, file)
+                with open(filename, "rb") as f_in, gzip.open(filename + ".gz", "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+                os.remove(filename)
+
+        # File names contain the date, so sorting them sorts by age
+        compressed_logs = sorted(os.path.join(self.logs_dir, file) for file in os.listdir(self.logs_dir)
+                                 if file.startswith(LOG_FILE_PREFIX) and file.endswith(".log.gz"))
+        total_size = sum(os.path.getsize(filename) for filename in compressed_logs) + \
+            os.path.getsize(os.path.join(self.logs_dir, current_log))
+
+        while compressed_logs and total_size > self.max_total_size:
+            oldest_log = compressed_logs.pop(0)
+            total_size -= os.path.getsize(oldest_log)
+            os.remove(oldest_log)
+
+    def write_line(self, line: str):
+        date = time.strftime("%Y-%m-%d")
+        if date != self.file_date or self.file_size >= self.max_file_size:
+            self.open_log_file(date)
+
+        self.file.write(line + "\n")
+        self.file_size += len(line.encode("utf-8")) + 1
+
+    def writer_loop(self):
+        last_flush = time.monotonic()
+        unflushed = False
+        # Only the first of consecutive errors is reported
+        failing = False
+
+        while 1:
+            try:
+                # Only wake up on a timer while there are lines to flush
+                line = self.queue.get(timeout=self.flush_interval if unflushed else None)
+            except queue.Empty:
+                line = ""
+
+            if line is None:
+                break
+
+            # The thread has to keep running, lines that can not be written are lost
+            try:
+                if line:
+                    self.write_line(line)
+                    unflushed = True
+
+                # Lines are written to the file buffer and flushed together
+                if unflushed and time.monotonic() - last_flush >= self.flush_interval:
+                    self.file.flush()
+                    last_flush = time.monotonic()
+                    unflushed = False
+
+                failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"Could not write log file: {e}")
+                failing = True
+                unflushed = False
+
+                # The log file is opened again for the next line
+                if self.file:
+                    try:
+                        self.file.close()
+                    except OSError:
+                        pass
+                    self.file = None
+                self.file_date = ""
+
+        if self.file:
+            self.file.close()
+
+    def close(self):
+        """Write all queued lines and close the log file"""
+        self.queue.put(None)
+        self.writer_thread.join()
@@ -11,9 +11,13 @@ else:
     USER_SETTINGS_CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".config", "EDNeutronAssistant",
                                              "user_settings.json")
 
-USER_SETTINGS = {"theme": 1}
+# Route backends
+SPANSH_BACKEND = 0
+LOCAL_BACKEND = 1
+
+USER_SETTINGS = {"theme": 1, "route_backend": SPANSH_BACKEND}
 if os.path.isfile(USER_SETTINGS_CONFIG_PATH):
-    USER_SETTINGS = json.load(open(USER_SETTINGS_CONFIG_PATH, "r"))
+    USER_SETTINGS.update(json.load(open(USER_SETTINGS_CONFIG_PATH, "r")))
 
 
 def save_user_settings():
@@ -60,6 +64,36 @@ class ThemeSelectionFrame(ttk.Frame):
                 self.main_application.apply_theme(new_theme)
 
 
+class RouteBackendSelectionFrame(ttk.Frame):
+
+    def __init__(self, master, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.master = master
+
+        self.backend_variable = tk.IntVar()
+        self.backend_variable.set(USER_SETTINGS["route_backend"])
+
+        # Row 0
+        self.backend_lbl = ttk.Label(self, text="Neutron Route Calculation")
+        self.backend_lbl.grid(row=0, column=0, padx=3, pady=3, sticky="W")
+
+        # Row 1
+        self.spansh_backend_radiobutton = ttk.Radiobutton(self, text="Spansh", variable=self.backend_variable,
+                                                          value=SPANSH_BACKEND, command=self.update_backend)
+        self.spansh_backend_radiobutton.grid(row=1, column=0, padx=3, pady=3, sticky="W")
+
+        # Row 2
+        self.local_backend_radiobutton = ttk.Radiobutton(self, text="Local star data", variable=self.backend_variable,
+                                                         value=LOCAL_BACKEND, command=self.update_backend)
+        self.local_backend_radiobutton.grid(row=2, column=0, padx=3, pady=3, sticky="W")
+
+    def update_backend(self):
+        if USER_SETTINGS["route_backend"] != self.backend_variable.get():
+            USER_SETTINGS["route_backend"] = self.backend_variable.get()
+            save_user_settings()
+
+
 class OptionsMenu(tk.Toplevel):
 
     def __init__(self, master, *args, **kwargs):
@@ -76,6 +110,10 @@ class OptionsMenu(tk.Toplevel):
         self.theme_selection_frame = ThemeSelectionFrame(self, self)
         self.theme_selection_frame.grid(row=0, column=0, padx=3, pady=3)
 
+        # Row 1
+        self.route_backend_selection_frame = RouteBackendSelectionFrame(self, self)
+        self.route_backend_selection_frame.grid(row=1, column=0, padx=3, pady=3, sticky="W")
+
     def terminate(self):
         self.grab_release()
         self.destroy()
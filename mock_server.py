@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import module_data
+import ship_stats
+import jump_physics
+
+
+def get_system_position(system: str) -> tuple:
+    """Deterministic coordinates of a system name, so all endpoints agree on where a system is"""
+    digest = hashlib.sha256(system.lower().encode("utf-8")).digest()
+    return tuple(round((int.from_bytes(digest[i:i + 4], "little") / 2 ** 32 - .5) * 20000, 5) for i in (0, 4, 8))
+
+
+def get_distance(position1: tuple, position2: tuple) -> float:
+    return sum((a - b) ** 2 for a, b in zip(position1, position2)) ** .5
+
+
+def generate_route(start_system: str, end_system: str, ship_range: float, route_type: str) -> list:
+    """Straight route between two systems with made up waypoints, in the schema of the Spansh results"""
+
+    start, end = get_system_position(start_system), get_system_position(end_system)
+    total_distance = get_distance(start, end)
+
+    # Simple routes only contain the neutron stars, exact routes every jump
+    hop_distance = ship_range * (jump_physics.NEUTRON_SUPERCHARGE if route_type == "simple" else 1)
+    hop_count = max(int(total_distance // hop_distance), 0) + 1
+
+    route = []
+    for index in range(hop_count + 1):
+        fraction = index / hop_count
+        position = tuple(a + (b - a) * fraction for a, b in zip(start, end))
+        name = start_system if index == 0 else end_system if index == hop_count else \
+            f"Mock {hashlib.sha256(f'{start_system}{end_system}{index}'.encode('utf-8')).hexdigest()[:8]}"
+        distance_jumped = 0.0 if index == 0 else total_distance / hop_count
+        distance_left = total_distance * (1 - fraction)
+        x, y, z = position
+
+        if route_type == "simple":
+            route.append({"system": name, "distance_jumped": round(distance_jumped, 2),
+                          "distance_left": round(distance_left, 2),
+                          "jumps": 0 if index == 0 else max(1, round(distance_jumped / hop_distance)),
+                          "neutron_star": 0 < index < hop_count, "x": x, "y": y, "z": z, "id64": index})
+        else:
+            route.append({"name": name, "distance": round(distance_jumped, 2),
+                          "distance_to_destination": round(distance_left, 2), "fuel_in_tank": 32.0,
+                          "fuel_used": 0.0 if index == 0 else 2.0, "must_refuel": False, "has_neutron": False,
+                          "is_scoopable": True, "x": x, "y": y, "z": z, "id64": index})
+
+    return route
+
+
+class MockState:
+    """Behaviour of the stand-in server, shared by all request handler threads"""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, job_duration: float = 2.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.job_duration = job_duration
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # job id -> (time the job is done, result)
+        self.jobs = {}
+
+        # Token bucket allowing throttle_rate requests per second, rates below 1 still allow single requests
+        self.burst_size = max(throttle_rate, 1)
+        self.tokens = self.burst_size
+        self.last_refill = time.monotonic()
+
+        # Never updated, only the module data shipped with the application is used
+        self.modules = module_data.ModuleData(os.path.join(tempfile.gettempdir(), "EDNeutronAssistantMock"),
+                                              os.path.dirname(os.path.abspath(__file__)))
+
+    def get_delay(self) -> float:
+        with self.lock:
+            return max(self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter), 0.0)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def should_throttle(self) -> bool:
+        if not self.throttle_rate:
+            return False
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.last_refill) * self.throttle_rate, self.burst_size)
+            self.last_refill = now
+
+            if self.tokens < 1:
+                return True
+            self.tokens -= 1
+            return False
+
+    def add_job(self, result: dict) -> str:
+        job_id = str(uuid.UUID(int=self.random.getrandbits(128)))
+        with self.lock:
+            self.jobs[job_id] = (time.monotonic() + self.job_duration, result)
+        return job_id
+
+    def get_job(self, job_id: str) -> dict:
+        with self.lock:
+            job = self.jobs.get(job_id)
+
+        if job is None:
+            return {"error": "Job not found"}
+
+        done_time, result = job
+        if time.monotonic() < done_time:
+            return {"job": job_id, "status": "queued"}
+        return {"job": job_id, "status": "ok", "result": result}
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """Implements the Spansh, EDSM and coriolis conversion endpoints used by the application"""
+
+    state: MockState = None
+
+    def log_message(self, format_, *args):
+        pass
+
+    def send_json(self, data, status: int = 200, headers: dict = None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def handle_request(self, method: str):
+        time.sleep(self.state.get_delay())
+
+        if self.state.should_throttle():
+            self.send_json({"error": "Too many requests"}, 429, {"Retry-After": "1"})
+            return
+        if self.state.should_fail():
+            self.send_json({"error": "Injected server error"}, 500)
+            return
+
+        url = urllib.parse.urlsplit(self.path)
+        query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+
+        if method == "POST" and url.path in ("/api/route", "/api/generic/route"):
+            form = {key: values[0] for key, values in urllib.parse.parse_qs(self.read_body().decode("utf-8")).items()}
+            if url.path == "/api/route":
+                result = {"system_jumps": generate_route(form["from"], form["to"], float(form["range"]), "simple")}
+            else:
+                ship_range = float(form.get("optimal_mass", 1000)) / float(form.get("base_mass", 400)) * 10
+                result = {"jumps": generate_route(form["source"], form["destination"], ship_range, "exact")}
+            self.send_json({"job": self.state.add_job(result), "status": "queued"})
+
+        elif method == "GET" and url.path.startswith("/api/results/"):
+            self.send_json(self.state.get_job(url.path[len("/api/results/"):]))
+
+        elif method == "GET" and url.path == "/api/systems":
+            prefix = query.get("q", "")
+            self.send_json([prefix] + [f"{prefix} {suffix}" for suffix in ("A", "B", "AB 1", "XY-Z c1")] if prefix
+                           else [])
+
+        elif method == "GET" and url.path == "/api-v1/system":
+            system = query.get("systemName", "")
+            x, y, z = get_system_position(system)
+            self.send_json({"name": system, "coords": {"x": x, "y": y, "z": z}})
+
+        elif method == "POST" and url.path == "/convert":
+            build = ship_stats.convert_loadout_event(json.loads(self.read_body()), self.state.modules)
+            if build is None:
+                self.send_json({"error": "Unknown modules"}, 400)
+            else:
+                self.send_json(build)
+
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+def create_server(port: int = 8000, **state_options) -> ThreadingHTTPServer:
+    """Create a stand-in server on localhost, port 0 picks a free port"""
+
+    handler = type("MockRequestHandler", (MockRequestHandler,), {"state": MockState(**state_options)})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Spansh, EDSM and coriolis APIs")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="random variation of the latency")
+    parser.add_argument("--job-duration", type=float, default=2.0, help="seconds until a route job is done")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="requests per second before answering with 429, 0 disables throttling")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = create_server(args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                           job_duration=args.job_duration, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, seed=args.seed)
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Serving on {base_url}, start EDNeutronAssistant with")
+    print(f"  EDNA_SPANSH_API_URL={base_url}/api")
+    print(f"  EDNA_EDSM_API_URL={base_url}/api-v1")
+    print(f"  EDNA_CORIOLIS_API_URL={base_url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import os
+import json
+import threading
+from collections import namedtuple
+
+import configuration
+
+FSD_DATA_URL = "https://raw.githubusercontent.com/EDCD/coriolis-data/master/modules/standard/frame_shift_drive.json"
+
+FsdRecord = namedtuple("FsdRecord", ["optmass", "maxfuel", "fuelmul", "fuelpower"])
+
+
+def index_fsd_data(fsd_data: list) -> dict:
+    """Map (class, rating) to the values of the FSD that are needed for route calculations"""
+    return {(int(fsd["class"]), fsd["rating"].upper()): FsdRecord(fsd["optmass"], fsd["maxfuel"], fsd["fuelmul"],
+                                                                  fsd["fuelpower"]) for fsd in fsd_data}
+
+
+class ModuleData:
+    """Local copy of the coriolis module data. The data is read from the config directory, or from the copy shipped
+    with the application if it was never downloaded, and revalidated against GitHub with conditional requests"""
+
+    def __init__(self, config_path: str, fallback_path: str):
+        self.modules_dir = os.path.join(config_path, "modules")
+        self.fsd_file = os.path.join(self.modules_dir, "frame_shift_drive.json")
+        self.meta_file = os.path.join(self.modules_dir, "frame_shift_drive.meta.json")
+        self.fallback_fsd_file = os.path.join(fallback_path, "data", "frame_shift_drive.json")
+
+        self.lock = threading.Lock()
+        self.fsd_index = None
+
+    def load(self):
+        """Index the downloaded FSD data, fall back to the shipped copy if it is missing or broken"""
+
+        for filename in (self.fsd_file, self.fallback_fsd_file):
+            try:
+                with open(filename, "r") as f:
+                    fsd_index = index_fsd_data(json.load(f)["fsd"])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+                continue
+
+            with self.lock:
+                self.fsd_index = fsd_index
+            return
+
+        with self.lock:
+            self.fsd_index = {}
+
+    def get_fsd(self, fsd_class, rating: str) -> FsdRecord:
+        """Return the values of an FSD, None if it is unknown"""
+
+        if self.fsd_index is None:
+            self.load()
+
+        return self.fsd_index.get((int(fsd_class), rating.upper()))
+
+    def update(self, log_function=print, verbose=False):
+        """Download the FSD data if it changed since the last download"""
+        import requests
+
+        try:
+            with open(self.meta_file, "r") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = {}
+
+        headers = {}
+        if os.path.isfile(self.fsd_file):
+            if "etag" in meta:
+                headers["If-None-Match"] = meta["etag"]
+            if "last_modified" in meta:
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = requests.get(FSD_DATA_URL, headers=headers, timeout=10)
+        except requests.RequestException as e:
+            log_function(f"Could not update module data: {e}")
+            return
+
+        if response.status_code == 304:
+            if verbose:
+                log_function("Module data is up to date")
+            return
+
+        try:
+            fsd_index = index_fsd_data(response.json()["fsd"])
+        except (ValueError, KeyError, TypeError):
+            log_function(f"Could not update module data, received invalid response with status code "
+                         f"{response.status_code}")
+            return
+
+        if not os.path.isdir(self.modules_dir):
+            os.makedirs(self.modules_dir)
+
+        configuration.write_file_atomic(self.fsd_file, response.text)
+        configuration.write_file_atomic(self.meta_file, json.dumps(
+            {key: response.headers[header] for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+             if header in response.headers}))
+
+        with self.lock:
+            self.fsd_index = fsd_index
+
+        if verbose:
+            log_function(f"Updated module data, {len(fsd_index)} FSDs known")
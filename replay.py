@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+import utils
+import tracker
+import api_access
+import coordinates
+import benchmark
+from EDNeutronAssistant import __version__
+
+
+class LatencyRecorder:
+    """Matches the time a jump was written to the journal with the time the next system was copied and shown"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending_copies = {}
+        self.pending_displays = {}
+        self.copy_latencies = []
+        self.display_latencies = []
+        self.all_copied = threading.Event()
+        self.all_copied.set()
+
+    def expect(self, next_system: str):
+        with self.lock:
+            now = time.perf_counter()
+            self.pending_copies[next_system] = now
+            self.pending_displays[next_system] = now
+            self.all_copied.clear()
+
+    def record(self, pending: dict, latencies: list, system: str):
+        with self.lock:
+            written = pending.pop(system, None)
+            if written is not None:
+                latencies.append(time.perf_counter() - written)
+            if not self.pending_copies:
+                self.all_copied.set()
+
+    def copy(self, system: str):
+        self.record(self.pending_copies, self.copy_latencies, system)
+
+    def display(self, system: str):
+        self.record(self.pending_displays, self.display_latencies, system)
+
+
+class LatencyObserver(tracker.TrackerObserver):
+
+    def __init__(self, recorder: LatencyRecorder):
+        self.recorder = recorder
+
+    def on_next_system(self, system: str, *args):
+        self.recorder.display(system)
+
+
+def generate_route_journal(hop_count: int, filler_events: int = 5, seed: int = 0) -> (list, list):
+    """Synthetic route and a journal that follows it, with filler events between the jumps"""
+
+    rng = random.Random(seed)
+    route = benchmark.generate_route(hop_count, "simple", seed)
+
+    entries = [{"event": "Fileheader", "part": 1, "language": "English/UK", "gameversion": "4.0.0.1000"},
+               {"event": "Commander", "FID": "F1", "Name": "Replay"},
+               {"event": "Location", "StarSystem": route[0]["system"],
+                "StarPos": [route[0]["x"], route[0]["y"], route[0]["z"]]}]
+    for route_entry in route[1:]:
+        entries += [rng.choice(benchmark.FILLER_EVENTS) for _ in range(filler_events)]
+        entries.append({"event": "FSDJump", "StarSystem": route_entry["system"],
+                        "StarPos": [route_entry["x"], route_entry["y"], route_entry["z"]], "JumpDist": 42.0})
+
+    lines = [json.dumps({"timestamp": benchmark.get_timestamp(1600000000 + index), **entry},
+                        separators=(", ", ":")) for index, entry in enumerate(entries)]
+    return route, lines
+
+
+def get_route_from_journal(lines: list) -> list:
+    """Use the systems jumped to in a recorded journal as route, so every jump has a next system"""
+
+    route = []
+    for line in lines:
+        entry = json.loads(line)
+        if entry.get("event") in ("Location", "FSDJump") and "StarPos" in entry:
+            x, y, z = entry["StarPos"]
+            if route and route[-1]["system"] == entry["StarSystem"]:
+                continue
+            route.append({"system": entry["StarSystem"], "distance_jumped": 0, "distance_left": 0, "jumps": 1,
+                          "neutron_star": False, "x": x, "y": y, "z": z})
+
+    # Distance left is measured along the route here, only used for the displayed distances
+    for index in range(len(route) - 2, -1, -1):
+        distance = coordinates.get_distance(route[index], route[index + 1])
+        route[index + 1]["distance_jumped"] = round(distance, 2)
+        route[index]["distance_left"] = round(route[index + 1]["distance_left"] + distance, 2)
+
+    return route
+
+
+def create_tracker(config_path: str, recorder: LatencyRecorder, poll_rate: float, use_inotify: bool,
+                   log: list) -> tracker.RouteTracker:
+    """RouteTracker logging into a list instead of stdout, without its background tasks"""
+
+    route_tracker = tracker.RouteTracker(config_path, os.path.dirname(os.path.abspath(__file__)),
+                                         poll_rate=poll_rate)
+    route_tracker.print_log = lambda *args: log.append("".join(map(str, args)))
+    route_tracker.load_configuration()
+    route_tracker.add_observer(LatencyObserver(recorder))
+
+    if not use_inotify:
+        route_tracker.journal_watcher.libc = None
+
+    return route_tracker
+
+
+def replay(lines: list, route: list, speed: float = 1.0, max_gap: float = 1.0, poll_rate: float = 1.0,
+           use_inotify: bool = True, settle_timeout: float = 5.0) -> dict:
+    """Append journal lines to a temporary journal while the tracker loop is running and return the latency
+    from each jump to the next system being copied and displayed"""
+
+    recorder = LatencyRecorder()
+    log = []
+
+    # Nothing is copied into the real clipboard
+    original_copy_system_to_clipboard = utils.copy_system_to_clipboard
+    utils.copy_system_to_clipboard = lambda system, log_function=print: recorder.copy(system)
+    original_convert = api_access.convert_loadout_event_to_coriolis
+    api_access.convert_loadout_event_to_coriolis = lambda loadout_event: {
+        "stats": {"fullTankRange": loadout_event["MaxJumpRange"]}}
+
+    next_systems = {route[index]["system"]: route[index + 1]["system"] for index in range(len(route) - 1)}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal_dir = os.path.join(temp_dir, "journal")
+        os.makedirs(journal_dir)
+        journal_file = os.path.join(journal_dir, "Journal.2020-09-13T120000.01.log")
+
+        # The session header up to the first known position is written before the loop starts, so the route is
+        # joined at its start instead of looking up the position of an unknown system
+        header_length = next((index + 1 for index, line in enumerate(lines) if '"StarPos"' in line), 0)
+        with open(journal_file, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines[:header_length])
+
+        route_tracker = create_tracker(os.path.join(temp_dir, "config"), recorder, poll_rate, use_inotify, log)
+        route_tracker.configuration["route"] = route
+        route_tracker.configuration["route_type"] = "simple"
+        route_tracker.configuration["route_progress"] = -1
+
+        # The application reads the game directory, redirected to the replayed journal
+        original_get_game_log_directory = utils.get_game_log_directory
+        utils.get_game_log_directory = lambda *args, **kwargs: journal_dir
+
+        loop_thread = threading.Thread(target=route_tracker.application_loop, daemon=True)
+        loop_thread.start()
+
+        try:
+            start_time = time.monotonic()
+            while not route_tracker.configuration["last_copied"] and time.monotonic() - start_time < settle_timeout:
+                time.sleep(.01)
+
+            last_timestamp = None
+            with open(journal_file, "a", encoding="utf-8") as f:
+                for line in lines[header_length:]:
+                    entry = json.loads(line)
+
+                    timestamp = time.mktime(time.strptime(entry["timestamp"], "%Y-%m-%dT%H:%M:%SZ"))
+                    if last_timestamp is not None and speed:
+                        time.sleep(min(max(timestamp - last_timestamp, 0) / speed, max_gap))
+                    last_timestamp = timestamp
+
+                    if entry.get("event") == "FSDJump" and entry["StarSystem"] in next_systems:
+                        recorder.expect(next_systems[entry["StarSystem"]])
+
+                    f.write(line + "\n")
+                    f.flush()
+
+                    # Without delays, each jump has to be copied before the next one is written, otherwise jumps
+                    # read at once are only copied once
+                    if not speed:
+                        recorder.all_copied.wait(settle_timeout)
+
+            recorder.all_copied.wait(settle_timeout)
+        finally:
+            # Waits for the application loop and closes all files of the tracker
+            route_tracker.stop(settle_timeout + poll_rate)
+            loop_thread.join()
+
+            utils.get_game_log_directory = original_get_game_log_directory
+            utils.copy_system_to_clipboard = original_copy_system_to_clipboard
+            api_access.convert_loadout_event_to_coriolis = original_convert
+
+    return {"clipboard": summarize(recorder.copy_latencies), "display": summarize(recorder.display_latencies),
+            "missed_jumps": len(recorder.pending_copies)}
+
+
+def summarize(latencies: list) -> dict:
+    if not latencies:
+        return {"count": 0}
+
+    milliseconds = np.array(latencies) * 1000
+    return {"count": len(latencies), "mean_ms": float(milliseconds.mean()),
+            "p50_ms": float(np.percentile(milliseconds, 50)), "p95_ms": float(np.percentile(milliseconds, 95)),
+            "p99_ms": float(np.percentile(milliseconds, 99)), "max_ms": float(milliseconds.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the latency from a jump in the journal to the next system "
+                                                 "being copied to the clipboard")
+    parser.add_argument("--journal", default="", help="recorded journal to replay, a synthetic one is used if empty")
+    parser.add_argument("--hops", type=int, default=200, help="length of the synthetic route")
+    parser.add_argument("--speed", type=float, default=10.0,
+                        help="replay speed relative to the journal timestamps, 0 writes the next line as soon as "
+                             "the previous jump was copied")
+    parser.add_argument("--max-gap", type=float, default=1.0, help="longest pause between two lines in seconds")
+    parser.add_argument("--poll-rate", type=float, default=1.0, help="poll rate of the application loop")
+    parser.add_argument("--no-inotify", action="store_true", help="poll the journal even if inotify is available")
+    parser.add_argument("--output", default="", help="file to save the results to as JSON")
+    args = parser.parse_args()
+
+    if args.journal:
+        with open(args.journal, "r", encoding="utf-8") as f:
+            lines = [line.rstrip("\n") for line in f if line.strip()]
+        route = get_route_from_journal(lines)
+    else:
+        route, lines = generate_route_journal(args.hops)
+
+    results = replay(lines, route, speed=args.speed, max_gap=args.max_gap, poll_rate=args.poll_rate,
+                     use_inotify=not args.no_inotify)
+
+    for name in ("clipboard", "display"):
+        summary = results[name]
+        if summary["count"]:
+            print(f"{name:<10} {summary['count']:>5} jumps   p50 {summary['p50_ms']:8.2f} ms   "
+                  f"p95 {summary['p95_ms']:8.2f} ms   p99 {summary['p99_ms']:8.2f} ms   "
+                  f"max {summary['max_ms']:8.2f} ms")
+        else:
+            print(f"{name:<10} no jumps measured")
+    if results["missed_jumps"]:
+        print(f"{results['missed_jumps']} jumps were not copied")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"version": __version__, "journal": args.journal or f"synthetic {args.hops}",
+                       "speed": args.speed, "poll_rate": args.poll_rate, "inotify": not args.no_inotify,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
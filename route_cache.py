@@ -0,0 +1,320 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+
+import configuration
+import route_model
+
+
+def normalize_system_name(system_name: str) -> str:
+    """System names are case insensitive and surrounding whitespace is not part of the name"""
+    return " ".join(system_name.split()).lower()
+
+
+def get_simple_route_params(efficiency: int, ship_range: float, start_system: str, end_system: str) -> dict:
+    return {"type": "simple", "from": normalize_system_name(start_system), "to": normalize_system_name(end_system),
+            "efficiency": int(efficiency), "range": round(float(ship_range), 2)}
+
+
+def get_exact_route_params(start_system: str, end_system: str, payload: dict, use_injections: bool) -> dict:
+    """Only the values sent to Spansh are used, so different builds with the same FSD relevant stats share routes"""
+
+    params = {"type": "exact", "from": normalize_system_name(start_system), "to": normalize_system_name(end_system),
+              "use_injections": bool(use_injections)}
+
+    for key, value in payload.items():
+        if key in ("source", "destination", "ship_build"):
+            continue
+        params[key] = round(float(value), 4) if isinstance(value, float) else value
+
+    return params
+
+
+def get_params_key(params: dict) -> str:
+    """Canonical hash of route parameters"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:24]
+
+
+def get_slice_key(params: dict) -> str:
+    """Hash of all parameters except the start system, routes with the same slice key can be sliced into each other"""
+    return get_params_key({key: value for key, value in params.items() if key != "from"})
+
+
+# Fields of the first entry of a route that describe the jump into it, 0 for the start system of any route
+ROUTE_START_FIELDS = {"simple": ("distance_jumped", "jumps"), "exact": ("distance", "fuel_used")}
+
+
+def get_route_suffix(route: list, start_index: int, route_type: str) -> list:
+    """Return the part of a route from start_index to the destination as if it had been calculated from there. Fields
+    that describe a single jump or are measured to the destination stay unchanged, only the jump into the new start
+    system is removed"""
+
+    suffix = [dict(route_entry) for route_entry in route[start_index:]]
+
+    for field in ROUTE_START_FIELDS[route_type]:
+        suffix[0][field] = 0
+
+    return suffix
+
+
+class RouteCache:
+    """Cache of calculated routes in the routes directory. Routes are stored gzip compressed under the hash of their
+    canonical parameters, an index file keeps their sizes and last access times. The least recently used routes are
+    removed once the cache exceeds max_size bytes.
+
+    Access times and statistics are saved at most once every save_interval seconds, call close() to save them on
+    exit"""
+
+    def __init__(self, config_path: str, max_size: int = 100 * 1024 * 1024, save_interval: float = 60):
+        self.routes_dir = os.path.join(config_path, "routes")
+        self.index_file = os.path.join(self.routes_dir, "index.json")
+        self.systems_file = os.path.join(self.routes_dir, "systems.json")
+        self.max_size = max_size
+        self.save_interval = save_interval
+
+        self.index_dirty = False
+        self.last_index_save = time.monotonic()
+
+        self.lock = threading.Lock()
+
+        if not os.path.isdir(self.routes_dir):
+            os.makedirs(self.routes_dir)
+
+        self.index = {"entries": {}, "stats": {"hits": 0, "misses": 0, "bytes_served": 0}}
+        try:
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        # Normalized system name -> keys of the cached routes containing it, loaded on first use
+        self.route_systems = None
+
+    def save_index(self):
+        configuration.write_file_atomic(self.index_file, json.dumps(self.index))
+        self.index_dirty = False
+        self.last_index_save = time.monotonic()
+
+    def request_index_save(self):
+        """Save the index if the last save is older than save_interval, otherwise it is saved with a later change"""
+
+        self.index_dirty = True
+        if time.monotonic() - self.last_index_save >= self.save_interval:
+            self.save_index()
+
+    def close(self):
+        with self.lock:
+            if self.index_dirty:
+                self.save_index()
+
+    def read_route(self, entry: dict) -> list:
+        with gzip.open(os.path.join(self.routes_dir, entry["file"]), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_route_systems(self):
+        """Load the system index of the cached routes, rebuild it from the route files if it is missing"""
+
+        try:
+            with open(self.systems_file, "r") as f:
+                self.route_systems = json.load(f)
+            return
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        self.route_systems = {}
+        for key, entry in list(self.index["entries"].items()):
+            try:
+                self.add_route_systems(key, self.read_route(entry))
+            except (OSError, json.JSONDecodeError):
+                self.index["entries"].pop(key)
+
+        self.save_route_systems()
+
+    def save_route_systems(self):
+        configuration.write_file_atomic(self.systems_file, json.dumps(self.route_systems))
+
+    def add_route_systems(self, key: str, systems: list):
+        for route_entry in systems:
+            keys = self.route_systems.setdefault(normalize_system_name(route_model.get_route_system_name(route_entry)),
+                                                 [])
+            if key not in keys:
+                keys.append(key)
+
+    def remove_route_systems(self, keys: set):
+        for system in list(self.route_systems):
+            remaining_keys = [key for key in self.route_systems[system] if key not in keys]
+            if remaining_keys:
+                self.route_systems[system] = remaining_keys
+            else:
+                del self.route_systems[system]
+
+    def get(self, params: dict) -> list:
+        """Return the cached route for the given parameters, None if it was not calculated before"""
+
+        key = get_params_key(params)
+
+        with self.lock:
+            entry = self.index["entries"].get(key)
+
+            try:
+                if not entry:
+                    raise FileNotFoundError
+                systems = self.read_route(entry)
+            except (FileNotFoundError, OSError, json.JSONDecodeError):
+                self.index["entries"].pop(key, None)
+                self.index["stats"]["misses"] += 1
+                self.request_index_save()
+                return None
+
+            entry["last_access"] = time.time()
+            self.index["stats"]["hits"] += 1
+            self.index["stats"]["bytes_served"] += entry["raw_size"]
+            self.request_index_save()
+
+        return systems
+
+    def get_slice(self, params: dict) -> list:
+        """Return the remaining part of a cached route that passes through the start system and was calculated with
+        the same destination and parameters, None if there is no such route"""
+
+        slice_key = get_slice_key(params)
+
+        with self.lock:
+            if self.route_systems is None:
+                self.load_route_systems()
+
+            for key in self.route_systems.get(params["from"], ()):
+                entry = self.index["entries"].get(key)
+                if not entry or entry.get("slice_key", get_slice_key(entry["params"])) != slice_key:
+                    continue
+
+                try:
+                    systems = self.read_route(entry)
+                except (OSError, json.JSONDecodeError):
+                    continue
+
+                start_index = self.find_slice_start(systems, params)
+                if start_index is None:
+                    continue
+
+                suffix = get_route_suffix(systems, start_index, params["type"])
+
+                entry["last_access"] = time.time()
+                self.index["stats"]["slice_hits"] = self.index["stats"].get("slice_hits", 0) + 1
+                self.request_index_save()
+
+                return suffix
+
+        return None
+
+    @staticmethod
+    def find_slice_start(systems: list, params: dict) -> int:
+        """Return the index the route can be sliced at for the start system of params, None if it can not be used"""
+
+        for index, route_entry in enumerate(systems[:-1]):
+            if normalize_system_name(route_model.get_route_system_name(route_entry)) != params["from"]:
+                continue
+
+            if params["type"] == "simple":
+                return index
+
+            # Exact routes also depend on the fuel and supercharge state at the start. Arriving at a system never
+            # leaves the ship supercharged and the route is only valid from systems that are left with a full tank
+            if params["is_supercharged"]:
+                return None
+            if index == 0 or route_entry.get("must_refuel") or \
+                    route_entry.get("fuel_in_tank", 0) >= params["tank_size"] - .01:
+                return index
+
+        return None
+
+    def put(self, params: dict, systems: list):
+        """Add a route to the cache and remove old routes if the cache is too large"""
+
+        key = get_params_key(params)
+        filename = f"{key}.json.gz"
+        raw_data = json.dumps(systems, separators=(",", ":")).encode("utf-8")
+        compressed_data = gzip.compress(raw_data)
+
+        with self.lock:
+            configuration.write_file_atomic(os.path.join(self.routes_dir, filename), compressed_data)
+
+            self.index["entries"][key] = {"file": filename, "size": len(compressed_data),
+                                          "raw_size": len(raw_data), "last_access": time.time(), "params": params,
+                                          "slice_key": get_slice_key(params)}
+
+            if self.route_systems is None:
+                self.load_route_systems()
+            self.add_route_systems(key, systems)
+
+            self.evict()
+            self.save_index()
+            self.save_route_systems()
+
+    def get_unindexed_files(self) -> list:
+        """Return the files in the routes directory that no index entry refers to, like routes saved by older versions
+        or temporary files of interrupted writes, as (modification time, size, path) tuples"""
+
+        known_files = {entry["file"] for entry in self.index["entries"].values()}
+        known_files.update((os.path.basename(self.index_file), os.path.basename(self.systems_file)))
+
+        unindexed_files = []
+        for entry in os.scandir(self.routes_dir):
+            if entry.name in known_files or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            unindexed_files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return unindexed_files
+
+    def evict(self):
+        """Remove least recently used routes until the cache fits into max_size. Files that are not in the index count
+        towards the size and are removed first, they can never be used"""
+
+        entries = self.index["entries"]
+        unindexed_files = self.get_unindexed_files()
+        total_size = sum(entry["size"] for entry in entries.values()) + sum(size for _, size, _ in unindexed_files)
+
+        for _, size, filename in sorted(unindexed_files):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total_size -= size
+
+        evicted_keys = set()
+        for key in sorted(entries, key=lambda key_: entries[key_]["last_access"]):
+            if total_size <= self.max_size:
+                break
+            total_size -= entries[key]["size"]
+            filename = os.path.join(self.routes_dir, entries.pop(key)["file"])
+            if os.path.isfile(filename):
+                os.remove(filename)
+            evicted_keys.add(key)
+
+        if evicted_keys and self.route_systems is not None:
+            self.remove_route_systems(evicted_keys)
+
+    def stats(self) -> dict:
+        """Return hit rate, size and saved bytes of the cache"""
+
+        with self.lock:
+            entries = self.index["entries"].values()
+            hits = self.index["stats"]["hits"]
+            misses = self.index["stats"]["misses"]
+            disk_size = sum(entry["size"] for entry in entries)
+            raw_size = sum(entry["raw_size"] for entry in entries)
+
+            return {"entries": len(entries), "hits": hits, "misses": misses,
+                    "slice_hits": self.index["stats"].get("slice_hits", 0),
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                    "disk_size": disk_size, "bytes_saved_by_compression": raw_size - disk_size,
+                    "bytes_served_from_cache": self.index["stats"]["bytes_served"]}
@@ -0,0 +1,128 @@
+import bisect
+import itertools
+from collections import namedtuple
+
+NextHop = namedtuple("NextHop", ["system", "distance", "jumps", "is_neutron"])
+
+
+def get_route_system_name(route_entry: dict) -> str:
+    """Simple routes name systems "system", exact routes "name" """
+    return route_entry["system"] if "system" in route_entry else route_entry["name"]
+
+
+class RejoinEngine:
+    """Finds the best system to rejoin a route from a position that is not on the route. The route coordinates are
+    kept as a (N, 3) array so a lookup is a single vectorized distance calculation. numpy is only imported once a
+    rejoin engine is needed, following a route does not need it"""
+
+    def __init__(self, route: list):
+        import numpy as np
+
+        self.route = route
+
+        self.systems = [get_route_system_name(route_entry) for route_entry in route]
+        self.positions = np.array([(route_entry["x"], route_entry["y"], route_entry["z"]) for route_entry in route],
+                                  dtype=np.float64).reshape(-1, 3)
+
+        # Distance along the route from each system to the destination
+        leg_distances = np.linalg.norm(np.diff(self.positions, axis=0), axis=1)
+        self.remaining_distances = np.append(np.cumsum(leg_distances[::-1])[::-1], 0.0)
+
+        self._spatial_index = None
+
+    @property
+    def spatial_index(self):
+        if self._spatial_index is None:
+            import spatial_index
+            self._spatial_index = spatial_index.SpatialIndex(self.positions)
+        return self._spatial_index
+
+    def find_rejoin_index(self, position, progress_weight: float = 0.0, min_index: int = 0) -> (int, float):
+        """Return index of and distance to the system that is best to rejoin the route at. Systems before min_index
+        are not considered. With a progress_weight above 0, systems closer to the destination are preferred"""
+        import numpy as np
+
+        min_index = min(max(min_index, 0), len(self.systems) - 1)
+
+        if isinstance(position, dict):
+            position = (position["x"], position["y"], position["z"])
+
+        # Without a progress weight the nearest system is the best, found in the spatial index. The number of
+        # neighbours is increased until one of them is not before min_index
+        if not progress_weight:
+            count = 4
+            while count < len(self.systems):
+                indices, distances = self.spatial_index.query_knn(position, count)
+                allowed = np.flatnonzero(indices >= min_index)
+                if len(allowed):
+                    # Equally distant systems are resolved in route order like the linear search
+                    nearest = allowed[distances[allowed] == distances[allowed[0]]]
+                    best_index = int(indices[nearest[np.argmin(indices[nearest])]])
+                    distance = np.linalg.norm(self.positions[best_index] - np.asarray(position, dtype=np.float64))
+                    return best_index, round(float(distance), 2)
+                count *= 4
+
+        distances = np.linalg.norm(self.positions[min_index:] - np.asarray(position, dtype=np.float64), axis=1)
+        costs = distances + progress_weight * self.remaining_distances[min_index:]
+
+        best_index = int(np.argmin(costs))
+
+        return best_index + min_index, round(float(distances[best_index]), 2)
+
+
+class RouteIndex:
+    """Information about a simple or exact route that is computed once when the route is loaded, so tracking the
+    progress along the route is a dictionary lookup"""
+
+    def __init__(self, route: list, route_type: str):
+        self.route = route
+        self.route_type = route_type
+
+        self.systems = [get_route_system_name(route_entry) for route_entry in route]
+        self.destination = self.systems[-1]
+
+        # Systems can appear more than once in a route
+        self.system_indices = {}
+        for index, system in enumerate(self.systems):
+            self.system_indices.setdefault(system, []).append(index)
+
+        # Distance from the start of the route to each system
+        if route_type == "simple":
+            self.distances = [route[0]["distance_left"] - route_entry["distance_left"] for route_entry in route]
+            self.neutron_flags = [route_entry["neutron_star"] for route_entry in route]
+            jumps = [int(route_entry["jumps"]) for route_entry in route]
+        else:
+            # Exact routes give the length of each single jump
+            self.distances = list(itertools.accumulate(route_entry["distance"] for route_entry in route))
+            self.neutron_flags = [route_entry["has_neutron"] for route_entry in route]
+            jumps = [1] * len(route)
+
+        # Information about the next system for each system of the route
+        self.next_hops = []
+        for index in range(len(route) - 1):
+            self.next_hops.append(NextHop(self.systems[index + 1],
+                                          round(self.distances[index + 1] - self.distances[index], 2),
+                                          jumps[index + 1], self.neutron_flags[index + 1]))
+
+        self._rejoin_engine = None
+
+    def __len__(self):
+        return len(self.systems)
+
+    @property
+    def rejoin_engine(self) -> RejoinEngine:
+        """Only built if the commander leaves the route"""
+        if self._rejoin_engine is None:
+            self._rejoin_engine = RejoinEngine(self.route)
+        return self._rejoin_engine
+
+    def find_progress_index(self, system: str, last_index: int = -1) -> int:
+        """Return the index of a system in the route, -1 if it is not part of the route. If the system appears more
+        than once, the first appearance at or after last_index is used"""
+
+        indices = self.system_indices.get(system)
+        if not indices:
+            return -1
+
+        position = bisect.bisect_left(indices, last_index)
+        return indices[position] if position < len(indices) else indices[-1]
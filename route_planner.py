@@ -0,0 +1,220 @@
+import os
+import json
+import math
+import heapq
+import threading
+
+import numpy as np
+
+import jump_physics
+import spatial_index
+
+class StarDataset:
+    """Coordinates of systems along with whether their main star is a neutron star"""
+
+    def __init__(self, names: list, positions: np.ndarray, neutron: np.ndarray):
+        self.names = names
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        self.neutron = np.asarray(neutron, dtype=bool)
+
+        self.name_indices = {name.lower(): index for index, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, system: str) -> int:
+        """Return the index of a system, -1 if it is not part of the dataset"""
+        return self.name_indices.get(system.lower(), -1)
+
+    def save(self, filename: str):
+        np.savez(filename, names=np.array(self.names), positions=self.positions, neutron=self.neutron)
+
+    @classmethod
+    def load(cls, filename: str):
+        with np.load(filename) as data:
+            return cls(data["names"].tolist(), data["positions"], data["neutron"])
+
+    @classmethod
+    def from_dump(cls, filename: str):
+        """Read a JSON dump with one system object per line like the Spansh galaxy dumps. Systems need a name,
+        coordinates and either the type of their main star or a "neutron" flag"""
+
+        names, positions, neutron = [], [], []
+        with open(filename, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip().rstrip(",")
+                if not line.startswith("{"):
+                    continue
+
+                try:
+                    system = json.loads(line)
+                    coordinates = system["coords"]
+                    position = (coordinates["x"], coordinates["y"], coordinates["z"])
+                    name = system["name"]
+                except (json.JSONDecodeError, KeyError):
+                    continue
+
+                names.append(name)
+                positions.append(position)
+                neutron.append(system.get("neutron", system.get("mainStar") == "Neutron Star"))
+
+        return cls(names, positions, neutron)
+
+
+def generate_synthetic_galaxy(count: int, radius: float = 5000, neutron_fraction: float = .02,
+                              seed: int = 0) -> StarDataset:
+    """Random systems in a flat disc, for offline tests and benchmarks of the planner"""
+
+    rng = np.random.default_rng(seed)
+
+    distances = radius * np.sqrt(rng.random(count))
+    angles = rng.random(count) * 2 * np.pi
+    positions = np.column_stack((distances * np.cos(angles), rng.normal(0, radius / 50, count),
+                                 distances * np.sin(angles)))
+
+    neutron = rng.random(count) < neutron_fraction
+
+    return StarDataset([f"Synthetic {index}" for index in range(count)], positions, neutron)
+
+
+class NeutronPlanner:
+    """Plots neutron highway routes on a local star dataset without contacting Spansh. Waypoints are neutron stars
+    inside a corridor around the direct line that gets narrower with higher efficiency. The route with the fewest
+    jumps is found with A*, every jump from a neutron star is supercharged"""
+
+    def __init__(self, dataset_filename: str = "", dataset: StarDataset = None):
+        self.dataset_filename = dataset_filename
+        self.dataset = dataset
+        self.neutron_index = None
+        self.lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load the dataset on first use, returns False if there is none"""
+
+        with self.lock:
+            if self.dataset is None:
+                if not os.path.isfile(self.dataset_filename):
+                    return False
+                self.dataset = StarDataset.load(self.dataset_filename)
+            return True
+
+    def get_neutron_index(self) -> spatial_index.SpatialIndex:
+        """Spatial index of the neutron stars, saved next to the dataset so it is only built once"""
+
+        if self.neutron_index is not None:
+            return self.neutron_index
+
+        index_filename = os.path.splitext(self.dataset_filename)[0] + "-neutrons.npz" if self.dataset_filename else ""
+
+        if index_filename and os.path.isfile(index_filename) and \
+                os.path.getmtime(index_filename) >= os.path.getmtime(self.dataset_filename):
+            self.neutron_index = spatial_index.SpatialIndex.load(index_filename)
+        else:
+            neutron_indices = np.flatnonzero(self.dataset.neutron)
+            self.neutron_index = spatial_index.SpatialIndex(self.dataset.positions[neutron_indices], neutron_indices)
+            if index_filename and os.path.isfile(self.dataset_filename):
+                self.neutron_index.save(index_filename)
+
+        return self.neutron_index
+
+    @staticmethod
+    def get_jumps(distance: float, ship_range: float, supercharged: bool) -> int:
+        """Number of jumps to cover distance, a supercharged first jump reaches four times as far"""
+
+        if supercharged:
+            boosted_range = jump_physics.NEUTRON_SUPERCHARGE * ship_range
+            if distance <= boosted_range:
+                return 1
+            return 1 + math.ceil((distance - boosted_range) / ship_range)
+
+        return max(math.ceil(distance / ship_range), 1)
+
+    def plot_route(self, start_system: str, end_system: str, ship_range: float, efficiency: int = 60,
+                   log_function=print) -> list:
+        """Plot a route in the format of the system_jumps of a Spansh neutron route, returns an empty list if the
+        route can not be plotted"""
+
+        if not self.load():
+            log_function("ERROR OCCURRED: No local star data available")
+            return []
+
+        dataset = self.dataset
+        start_index, end_index = dataset.find(start_system), dataset.find(end_system)
+        for system, index in ((start_system, start_index), (end_system, end_index)):
+            if index == -1:
+                log_function(f"ERROR OCCURRED: System {system} is not part of the local star data")
+                return []
+
+        positions = dataset.positions.astype(np.float64)
+        end_position = positions[end_index]
+        direct_distance = float(np.linalg.norm(end_position - positions[start_index]))
+
+        # Waypoints may make the route at most this much longer than the direct line
+        max_route_length = direct_distance * 100 / max(efficiency, 1)
+        search_radius = jump_physics.NEUTRON_SUPERCHARGE * ship_range
+        neutron_index = self.get_neutron_index()
+
+        def heuristic(index: int) -> float:
+            # A supercharged jump is the furthest a single jump can get, distance breaks ties between equal jumps
+            distance = float(np.linalg.norm(end_position - positions[index]))
+            return distance / search_radius + distance * 1e-6
+
+        # Entries are (estimated total cost, jumps, distance travelled, system index)
+        open_list = [(heuristic(start_index), 0, 0.0, start_index)]
+        best_costs = {start_index: 0.0}
+        previous = {start_index: None}
+        leg_jumps = {start_index: 0}
+
+        while open_list:
+            _, jumps, travelled, index = heapq.heappop(open_list)
+
+            if index == end_index:
+                break
+            if jumps + travelled * 1e-6 > best_costs.get(index, math.inf):
+                continue
+
+            supercharged = bool(dataset.neutron[index])
+
+            candidates, _ = neutron_index.query_radius(positions[index], search_radius)
+            candidates = candidates[candidates != index]
+
+            # Only neutron stars inside the efficiency corridor are used as waypoints
+            detour = np.linalg.norm(positions[candidates] - positions[start_index], axis=1) + \
+                np.linalg.norm(positions[candidates] - end_position, axis=1)
+            candidates = np.append(candidates[detour <= max_route_length], end_index)
+
+            distances = np.linalg.norm(positions[candidates] - positions[index], axis=1)
+
+            for candidate, distance in zip(candidates.tolist(), distances.tolist()):
+                candidate_jumps = self.get_jumps(distance, ship_range, supercharged)
+                new_jumps = jumps + candidate_jumps
+                new_travelled = travelled + distance
+                cost = new_jumps + new_travelled * 1e-6
+
+                if cost < best_costs.get(candidate, math.inf):
+                    best_costs[candidate] = cost
+                    previous[candidate] = index
+                    leg_jumps[candidate] = candidate_jumps
+                    heapq.heappush(open_list, (cost + heuristic(candidate), new_jumps, new_travelled, candidate))
+
+        waypoints = [end_index]
+        while previous[waypoints[-1]] is not None:
+            waypoints.append(previous[waypoints[-1]])
+        waypoints.reverse()
+
+        route = []
+        for position, index in enumerate(waypoints):
+            x, y, z = positions[index].tolist()
+            distance_jumped = 0.0 if position == 0 else \
+                float(np.linalg.norm(positions[index] - positions[waypoints[position - 1]]))
+            route.append({
+                "system": dataset.names[index],
+                "distance_jumped": round(distance_jumped, 2),
+                "distance_left": round(float(np.linalg.norm(end_position - positions[index])), 2),
+                "jumps": leg_jumps[index],
+                "neutron_star": bool(dataset.neutron[index]),
+                "x": x, "y": y, "z": z
+            })
+
+        return route
+
@@ -40,8 +40,10 @@ setup(
     options={
         "build_exe": {
             "packages": ["os", "sys", "time", "requests", "urllib.parse", "tkinter", "tkinter.ttk", "clipboard", "json",
-                         "threading", "tkinter.messagebox", "webbrowser", "io", "base64", "gzip"],
-            "include_files": ["logo.ico", "themes"],
+                         "threading", "tkinter.messagebox", "webbrowser", "io", "base64", "gzip", "sqlite3",
+                         "multiprocessing", "concurrent.futures", "ctypes", "select", "numpy", "heapq", "random",
+                         "mmap", "array", "queue"],
+            "include_files": ["logo.ico", "themes", "data"],
             "include_msvcr": True
         },
         "bdist_msi": {
@@ -0,0 +1,154 @@
+import re
+
+import module_data
+
+# Module class of the journal item names to coriolis ratings
+FSD_RATINGS = {1: "E", 2: "D", 3: "C", 4: "B", 5: "A"}
+
+GUARDIAN_FSD_BOOSTER_RANGES = {1: 4.0, 2: 6.0, 3: 7.8, 4: 9.3, 5: 10.5}
+
+# Overcharge (SCO) drives have their own stats that are not part of the module data, builds with them are converted
+# by coriolis
+FSD_ITEM_PATTERN = re.compile(r"int_hyperdrive_size(\d)_class(\d)")
+GUARDIAN_FSD_BOOSTER_ITEM_PATTERN = re.compile(r"int_guardianfsdbooster_size(\d)")
+
+
+def get_engineering_modifiers(module: dict) -> dict:
+    if "Engineering" not in module:
+        return {}
+    return {modifier["Label"]: modifier["Value"] for modifier in module["Engineering"].get("Modifiers", [])}
+
+
+def convert_loadout_event(loadout_event: dict, modules: module_data.ModuleData) -> dict:
+    """Calculate the stats of a ship from a loadout event. The result has the layout of a coriolis build, limited
+    to the values that are used for route calculations. Returns None if the FSD is not known"""
+    import jump_physics
+
+    fsd_module = None
+    fsd_class = fsd_rating = None
+    range_boost = 0.0
+    internal = []
+
+    for module in loadout_event["Modules"]:
+        item = module["Item"].lower()
+
+        match = FSD_ITEM_PATTERN.fullmatch(item)
+        if match:
+            fsd_module = module
+            fsd_class, fsd_rating = int(match.group(1)), FSD_RATINGS[int(match.group(2))]
+            continue
+
+        match = GUARDIAN_FSD_BOOSTER_ITEM_PATTERN.fullmatch(item)
+        if match:
+            booster_class = int(match.group(1))
+            range_boost = GUARDIAN_FSD_BOOSTER_RANGES[booster_class]
+            internal.append({"group": "Guardian Frame Shift Drive Booster", "class": booster_class})
+
+    if fsd_module is None:
+        return None
+
+    fsd = modules.get_fsd(fsd_class, fsd_rating)
+    if fsd is None:
+        return None
+
+    # Engineered values are part of the loadout event
+    modifiers = get_engineering_modifiers(fsd_module)
+    fsd = fsd._replace(optmass=modifiers.get("FSDOptimalMass", fsd.optmass),
+                       maxfuel=modifiers.get("MaxFuelPerJump", fsd.maxfuel))
+
+    unladen_mass = loadout_event["UnladenMass"]
+    fuel_capacity = loadout_event["FuelCapacity"]["Main"]
+    reserve_fuel_capacity = loadout_event["FuelCapacity"]["Reserve"]
+
+    full_tank_range = float(jump_physics.get_jump_range(jump_physics.FsdParameters(
+        fsd.optmass, fsd.fuelpower, fsd.fuelmul, fsd.maxfuel, range_boost, unladen_mass + reserve_fuel_capacity,
+        fuel_capacity, reserve_fuel_capacity)))
+
+    return {
+        "stats": {
+            "fullTankRange": round(full_tank_range, 2),
+            "unladenMass": unladen_mass,
+            "fuelCapacity": fuel_capacity,
+            "reserveFuelCapacity": reserve_fuel_capacity
+        },
+        "components": {
+            "standard": {
+                "frameShiftDrive": {"class": fsd_class, "rating": fsd_rating, "optmass": fsd.optmass,
+                                    "maxfuel": fsd.maxfuel}
+            },
+            "internal": internal
+        }
+    }
+
+
+def get_optimal_mass(build: dict, fsd: module_data.FsdRecord) -> float:
+    """Return the optimal mass of the FSD of a build. Builds calculated from the loadout event contain the engineered
+    value, the engineering of coriolis builds is applied to the base value of the FSD"""
+
+    build_fsd = build["components"]["standard"]["frameShiftDrive"]
+
+    if "optmass" in build_fsd:
+        return round(build_fsd["optmass"])
+
+    optimal_mass = fsd.optmass
+
+    # test if modified
+    if "blueprint" in build_fsd:
+        modification_grade = build_fsd["blueprint"]["grade"]
+        multiplier = build_fsd["blueprint"]["grades"][str(modification_grade)]["features"]["optmass"][1]
+
+        # test for experimental effect
+        if "special" in build_fsd["blueprint"]:
+            if build_fsd["blueprint"]["special"]["name"] == "Mass Manager":
+                multiplier += .062
+
+        optimal_mass *= multiplier + 1
+
+    return round(optimal_mass)
+
+
+def get_range_boost(build: dict) -> float:
+    boost = 0.0
+    for module in build["components"]["internal"]:
+        if module and module.get("group") == "Guardian Frame Shift Drive Booster":
+            boost = GUARDIAN_FSD_BOOSTER_RANGES[int(module["class"])]
+
+    return boost
+
+
+def get_route_fsd_values(build: dict, modules: module_data.ModuleData) -> dict:
+    """Return the FSD values of a build that exact routes are calculated with, None if the FSD is not known"""
+
+    build_fsd = build["components"]["standard"]["frameShiftDrive"]
+    fsd = modules.get_fsd(build_fsd["class"], build_fsd["rating"])
+    if fsd is None:
+        return None
+
+    return {"class": int(build_fsd["class"]), "rating": build_fsd["rating"].upper(),
+            "optimal_mass": get_optimal_mass(build, fsd), "max_fuel_per_jump": build_fsd.get("maxfuel", fsd.maxfuel),
+            "range_boost": get_range_boost(build)}
+
+
+def compare_builds(build: dict, coriolis_build: dict, modules: module_data.ModuleData, tolerance: float = .01) -> list:
+    """Return the stats and FSD values that differ between a locally calculated build and a build of the coriolis
+    conversion"""
+
+    def differs(value, coriolis_value) -> bool:
+        if isinstance(value, str) or coriolis_value is None:
+            return value != coriolis_value
+        return abs(value - coriolis_value) > tolerance * max(abs(coriolis_value), 1)
+
+    differences = []
+    for stat, value in build["stats"].items():
+        coriolis_value = coriolis_build["stats"].get(stat)
+        if differs(value, coriolis_value):
+            differences.append((stat, value, coriolis_value))
+
+    fsd_values = get_route_fsd_values(build, modules)
+    coriolis_fsd_values = get_route_fsd_values(coriolis_build, modules) or {}
+    for name, value in fsd_values.items():
+        coriolis_value = coriolis_fsd_values.get(name)
+        if differs(value, coriolis_value):
+            differences.append((f"frameShiftDrive.{name}", value, coriolis_value))
+
+    return differences
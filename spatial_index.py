@@ -0,0 +1,197 @@
+import heapq
+
+import numpy as np
+
+
+class SpatialIndex:
+    """KD-tree over 3D points for nearest neighbour and radius queries. Each point carries an integer id, e.g. its
+    index in a star dataset. Points added after the tree was built are kept in a small unsorted buffer that is
+    searched linearly, the tree is rebuilt once the buffer grows beyond rebuild_fraction of the tree"""
+
+    def __init__(self, points=None, ids=None, leaf_size: int = 16, rebuild_fraction: float = .1):
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+
+        # Tree points in tree order, each leaf covers a contiguous range
+        self.points = np.empty((0, 3), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+
+        # Node arrays, leaves have no children (-1)
+        self.node_start = self.node_end = self.node_left = self.node_right = np.empty(0, dtype=np.int64)
+        self.node_min = self.node_max = np.empty((0, 3), dtype=np.float32)
+
+        self.pending_points = []
+        self.pending_ids = []
+
+        if points is not None:
+            self.add(points, ids)
+            self.rebuild()
+
+    def __len__(self):
+        return len(self.ids) + len(self.pending_ids)
+
+    def add(self, points, ids=None):
+        """Add points to the index, ids default to the number of points added before"""
+
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+        if ids is None:
+            ids = np.arange(len(self), len(self) + len(points))
+
+        self.pending_points.append(points)
+        self.pending_ids.append(np.asarray(ids, dtype=np.int64))
+
+        if sum(map(len, self.pending_ids)) > max(self.rebuild_fraction * len(self.ids), self.leaf_size):
+            self.rebuild()
+
+    def get_pending(self) -> (np.ndarray, np.ndarray):
+        if not self.pending_ids:
+            return np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=np.int64)
+        if len(self.pending_ids) > 1:
+            self.pending_points = [np.concatenate(self.pending_points)]
+            self.pending_ids = [np.concatenate(self.pending_ids)]
+        return self.pending_points[0], self.pending_ids[0]
+
+    def rebuild(self):
+        """Build the tree from all points, splitting each node at the median of its widest dimension"""
+
+        pending_points, pending_ids = self.get_pending()
+        points = np.concatenate((self.points, pending_points))
+        ids = np.concatenate((self.ids, pending_ids))
+        self.pending_points, self.pending_ids = [], []
+
+        order = np.arange(len(points))
+        node_start, node_end, node_left, node_right, node_min, node_max = [], [], [], [], [], []
+
+        # Nodes are numbered in the order they are created, children are filled in once they exist
+        stack = [(0, len(points), -1, False)]
+        while stack:
+            start, end, parent, is_right = stack.pop()
+
+            node = len(node_start)
+            if parent != -1:
+                (node_right if is_right else node_left)[parent] = node
+
+            node_points = points[order[start:end]]
+            node_start.append(start)
+            node_end.append(end)
+            node_left.append(-1)
+            node_right.append(-1)
+            node_min.append(node_points.min(axis=0) if end > start else np.zeros(3, dtype=np.float32))
+            node_max.append(node_points.max(axis=0) if end > start else np.zeros(3, dtype=np.float32))
+
+            if end - start <= self.leaf_size:
+                continue
+
+            dimension = int(np.argmax(node_max[-1] - node_min[-1]))
+            middle = (end - start) // 2
+            partition = np.argpartition(node_points[:, dimension], middle)
+            order[start:end] = order[start:end][partition]
+
+            stack.append((start + middle, end, node, True))
+            stack.append((start, start + middle, node, False))
+
+        self.points = points[order]
+        self.ids = ids[order]
+        self.node_start = np.array(node_start, dtype=np.int64)
+        self.node_end = np.array(node_end, dtype=np.int64)
+        self.node_left = np.array(node_left, dtype=np.int64)
+        self.node_right = np.array(node_right, dtype=np.int64)
+        self.node_min = np.array(node_min, dtype=np.float32).reshape(-1, 3)
+        self.node_max = np.array(node_max, dtype=np.float32).reshape(-1, 3)
+
+    def get_box_distance(self, node: int, position: np.ndarray) -> float:
+        """Distance from position to the bounding box of a node, 0 if it is inside"""
+        offset = np.maximum(np.maximum(self.node_min[node] - position, position - self.node_max[node]), 0)
+        return float(np.sqrt(np.dot(offset, offset)))
+
+    def query_radius(self, position, radius: float) -> (np.ndarray, np.ndarray):
+        """Return ids of and distances to all points within radius of position"""
+
+        position = np.asarray(position, dtype=np.float32)
+        result_ids, result_distances = [], []
+
+        stack = [0] if len(self.node_start) and len(self.ids) else []
+        while stack:
+            node = stack.pop()
+            if self.get_box_distance(node, position) > radius:
+                continue
+
+            if self.node_left[node] == -1:
+                start, end = self.node_start[node], self.node_end[node]
+                distances = np.linalg.norm(self.points[start:end] - position, axis=1)
+                mask = distances <= radius
+                result_ids.append(self.ids[start:end][mask])
+                result_distances.append(distances[mask])
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+
+        pending_points, pending_ids = self.get_pending()
+        if len(pending_ids):
+            distances = np.linalg.norm(pending_points - position, axis=1)
+            mask = distances <= radius
+            result_ids.append(pending_ids[mask])
+            result_distances.append(distances[mask])
+
+        if not result_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(result_ids), np.concatenate(result_distances)
+
+    def query_knn(self, position, k: int = 1) -> (np.ndarray, np.ndarray):
+        """Return ids of and distances to the k nearest points, sorted by distance"""
+
+        position = np.asarray(position, dtype=np.float32)
+
+        # Candidates are kept as the k smallest distances found so far
+        candidate_ids = np.empty(0, dtype=np.int64)
+        candidate_distances = np.empty(0, dtype=np.float32)
+
+        def merge(ids, distances):
+            nonlocal candidate_ids, candidate_distances
+            candidate_ids = np.concatenate((candidate_ids, ids))
+            candidate_distances = np.concatenate((candidate_distances, distances))
+            if len(candidate_ids) > k:
+                nearest = np.argpartition(candidate_distances, k - 1)[:k]
+                candidate_ids, candidate_distances = candidate_ids[nearest], candidate_distances[nearest]
+
+        pending_points, pending_ids = self.get_pending()
+        if len(pending_ids):
+            merge(pending_ids, np.linalg.norm(pending_points - position, axis=1))
+
+        # Nodes are visited closest box first, until no box can contain a closer point
+        queue = [(0.0, 0)] if len(self.node_start) and len(self.ids) else []
+        while queue:
+            box_distance, node = heapq.heappop(queue)
+            if len(candidate_ids) == k and box_distance > candidate_distances.max():
+                break
+
+            if self.node_left[node] == -1:
+                start, end = self.node_start[node], self.node_end[node]
+                merge(self.ids[start:end], np.linalg.norm(self.points[start:end] - position, axis=1))
+            else:
+                for child in (self.node_left[node], self.node_right[node]):
+                    heapq.heappush(queue, (self.get_box_distance(child, position), child))
+
+        order = np.argsort(candidate_distances)
+        return candidate_ids[order], candidate_distances[order]
+
+    def save(self, filename: str):
+        """Save the index, pending points are added to the tree first"""
+
+        if self.pending_ids:
+            self.rebuild()
+
+        np.savez(filename, points=self.points, ids=self.ids, node_start=self.node_start, node_end=self.node_end,
+                 node_left=self.node_left, node_right=self.node_right, node_min=self.node_min,
+                 node_max=self.node_max, leaf_size=self.leaf_size)
+
+    @classmethod
+    def load(cls, filename: str):
+        index = cls()
+        with np.load(filename) as data:
+            index.points, index.ids = data["points"], data["ids"]
+            index.node_start, index.node_end = data["node_start"], data["node_end"]
+            index.node_left, index.node_right = data["node_left"], data["node_right"]
+            index.node_min, index.node_max = data["node_min"], data["node_max"]
+            index.leaf_size = int(data["leaf_size"])
+        return index
@@ -0,0 +1,212 @@
+import os
+import json
+import mmap
+import array
+import tempfile
+import threading
+
+MAGIC = b"EDNASIX1"
+HEADER_SIZE = len(MAGIC) + 8
+
+
+def read_names_from_dump(filename: str) -> list:
+    """Read system names from a text file with one name per line or from a JSON dump with one system object per line
+    like the EDSM and Spansh nightly dumps"""
+
+    names = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line or line in ("[", "]"):
+                continue
+            if line.startswith("{"):
+                try:
+                    names.append(json.loads(line)["name"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+            else:
+                names.append(line)
+
+    return names
+
+
+def get_trigrams(name: str) -> set:
+    padded = f"  {name.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SystemNameIndex:
+    """Sorted, memory mapped index of system names for instant autocomplete without network access. The file
+    contains the number of names, an offset table in native byte order and the names sorted case insensitively, so
+    prefix lookups are two binary searches"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.lock = threading.RLock()
+        # Held for a whole rebuild, so concurrent rebuilds do not drop each other's names
+        self.rebuild_lock = threading.Lock()
+
+        self.file = None
+        self.mmap = None
+        self.offsets = None
+        self.count = 0
+
+        # Only built when typo tolerant matching is used
+        self.trigram_index = None
+        self.building_trigram_index = False
+
+        self.open()
+
+    def open(self):
+        with self.lock:
+            self.close()
+
+            if not os.path.isfile(self.filename) or os.path.getsize(self.filename) < HEADER_SIZE:
+                return
+
+            self.file = open(self.filename, "rb")
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if self.mmap[:len(MAGIC)] != MAGIC:
+                self.close()
+                return
+
+            self.count = int.from_bytes(self.mmap[len(MAGIC):HEADER_SIZE], "little")
+            self.offsets = memoryview(self.mmap)[HEADER_SIZE:HEADER_SIZE + (self.count + 1) * 8].cast("Q")
+
+    def close(self):
+        with self.lock:
+            if self.offsets is not None:
+                self.offsets.release()
+            if self.mmap is not None:
+                self.mmap.close()
+            if self.file is not None:
+                self.file.close()
+            self.file = self.mmap = self.offsets = None
+            self.count = 0
+            self.trigram_index = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        return self.mmap[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def get_all_names(self) -> list:
+        with self.lock:
+            return [self[index] for index in range(self.count)]
+
+    def find_lower_bound(self, key: str) -> int:
+        """Index of the first name that is not smaller than key, compared case insensitively"""
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle].lower() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def prefix_range(self, prefix: str) -> (int, int):
+        """Return the range of indices of all names that start with prefix"""
+        prefix = prefix.lower()
+        return self.find_lower_bound(prefix), self.find_lower_bound(prefix + "\U0010ffff")
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        """Return up to limit names that start with prefix"""
+
+        with self.lock:
+            if not self.count or not prefix:
+                return []
+
+            start, end = self.prefix_range(prefix)
+            return [self[index] for index in range(start, min(end, start + limit))]
+
+    def fuzzy_search(self, query: str, limit: int = 10) -> list:
+        """Return up to limit names that are similar to query, tolerating typos"""
+
+        with self.lock:
+            if not self.count or len(query) < 3:
+                return []
+
+            # Building the trigram index takes a while, it is built in the background on first use
+            if self.trigram_index is None:
+                if not self.building_trigram_index:
+                    self.building_trigram_index = True
+                    threading.Thread(target=self.build_trigram_index, daemon=True).start()
+                return []
+
+            query_trigrams = get_trigrams(query)
+            scores = {}
+            for trigram in query_trigrams:
+                for index in self.trigram_index.get(trigram, ()):
+                    scores[index] = scores.get(index, 0) + 1
+
+            # Require at least half of the trigrams to match
+            candidates = [index for index, score in scores.items() if score * 2 >= len(query_trigrams)]
+            candidates.sort(key=lambda index: (-scores[index], len(self[index])))
+
+            return [self[index] for index in candidates[:limit]]
+
+    def build_trigram_index(self):
+        """Map each trigram to the indices of the names that contain it"""
+
+        with self.lock:
+            names = self.get_all_names()
+
+        trigram_index = {}
+        for index, name in enumerate(names):
+            for trigram in get_trigrams(name):
+                trigram_index.setdefault(trigram, array.array("I")).append(index)
+
+        with self.lock:
+            # The index might have been rebuilt in the meantime
+            if len(names) == self.count:
+                self.trigram_index = trigram_index
+            self.building_trigram_index = False
+
+    def rebuild(self, names):
+        """Replace the index with the given names merged with the names that are already indexed"""
+
+        with self.rebuild_lock:
+            all_names = {name.lower(): name for name in self.get_all_names()}
+            for name in names:
+                all_names.setdefault(name.lower(), name)
+
+            encoded_names = [all_names[key].encode("utf-8") for key in sorted(all_names)]
+
+            data_start = HEADER_SIZE + (len(encoded_names) + 1) * 8
+            offsets = array.array("Q", [data_start])
+            for encoded_name in encoded_names:
+                offsets.append(offsets[-1] + len(encoded_name))
+
+            file_descriptor, temp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)),
+                                                              prefix=".tmp-")
+            try:
+                with os.fdopen(file_descriptor, "wb") as f:
+                    f.write(MAGIC)
+                    f.write(len(encoded_names).to_bytes(8, "little"))
+                    f.write(offsets.tobytes())
+                    f.write(b"".join(encoded_names))
+
+                # Lookups are only blocked while the files are swapped, Windows does not allow replacing a mapped file
+                with self.lock:
+                    self.close()
+                    os.replace(temp_filename, self.filename)
+                    self.open()
+            except OSError:
+                if os.path.isfile(temp_filename):
+                    os.remove(temp_filename)
+                raise
+
+
+def merge_suggestions(*suggestion_lists, limit: int = 10) -> list:
+    """Merge lists of system names, keeping the order and dropping duplicates"""
+
+    merged = {}
+    for suggestions in suggestion_lists:
+        for name in suggestions:
+            merged.setdefault(name.lower(), name)
+
+    return list(merged.values())[:limit]
@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+import glob
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_access
+
+SHIP_BUILDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ship_builds")
+
+
+def main():
+    """Record the coriolis conversion of every loadout in the ship build fixtures that was not recorded yet, pass
+    --all to record them again"""
+
+    for filename in sorted(glob.glob(os.path.join(SHIP_BUILDS_DIR, "*.json"))):
+        with open(filename, "r") as f:
+            fixture = json.load(f)
+
+        if fixture["coriolis"] is not None and "--all" not in sys.argv:
+            continue
+
+        fixture["coriolis"] = api_access.convert_loadout_event_to_coriolis(fixture["loadout"])
+        with open(filename, "w") as f:
+            json.dump(fixture, f, indent=2)
+            f.write("\n")
+        print(f"Recorded {os.path.basename(filename)}")
+
+
+if __name__ == '__main__':
+    main()
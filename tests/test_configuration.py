@@ -0,0 +1,67 @@
+import configuration
+
+
+def test_broken_blob_falls_back_to_default(tmp_path):
+    config = configuration.Configuration(str(tmp_path), {"route": [], "ship_coriolis_build": {}})
+    config["route"] = [{"system": "Sol"}]
+    config["ship_coriolis_build"] = {"stats": {}}
+    config.close()
+
+    (tmp_path / "blobs" / "route.json").write_text("[{\"system\": ")
+    (tmp_path / "blobs" / "ship_coriolis_build.json").unlink()
+
+    messages = []
+    config = configuration.Configuration(str(tmp_path), {"route": [], "ship_coriolis_build": {}},
+                                         log_function=messages.append)
+    config.load()
+
+    assert config["route"] == []
+    assert config["ship_coriolis_build"] == {}
+    assert len(messages) == 2
+
+    # The defaults replace the broken files
+    config.close()
+    config = configuration.Configuration(str(tmp_path), {}, log_function=messages.append)
+    config.load()
+    assert config["route"] == []
+    assert len(messages) == 2
+
+
+def test_broken_blob_without_default_is_dropped(tmp_path):
+    config = configuration.Configuration(str(tmp_path), {})
+    config["route"] = [{"system": "Sol"}]
+    config.close()
+
+    (tmp_path / "blobs" / "route.json").unlink()
+
+    config = configuration.Configuration(str(tmp_path), {}, log_function=lambda *args: None)
+    config.load()
+
+    assert config.get("route") is None
+    assert "route" not in config
+
+
+def test_truncated_data_file_falls_back_to_defaults(tmp_path):
+    config = configuration.Configuration(str(tmp_path), {"current_system": "", "route": []})
+    config["current_system"] = "Sol"
+    config["route"] = [{"system": "Sol"}]
+    config.close()
+
+    data = (tmp_path / "data.json").read_text()
+    (tmp_path / "data.json").write_text(data[:len(data) // 2])
+
+    messages = []
+    config = configuration.Configuration(str(tmp_path), {"current_system": "", "route": []},
+                                         log_function=messages.append)
+    config.load()
+
+    assert config["current_system"] == ""
+    assert config["route"] == []
+    assert len(messages) == 1
+
+    # The defaults replace the broken file
+    config.close()
+    config = configuration.Configuration(str(tmp_path), {}, log_function=messages.append)
+    config.load()
+    assert config["current_system"] == ""
+    assert len(messages) == 1
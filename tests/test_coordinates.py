@@ -0,0 +1,71 @@
+import coordinates
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    store = coordinates.CoordinateStore(str(tmp_path), max_entries=10, memory_entries=4, access_batch_size=2)
+    store.put_many([(f"System {index}", {"x": index, "y": 0, "z": 0}) for index in range(10)])
+
+    # System 0 is served from the memory cache, the others are read from the database
+    store.coordinates_cache.put("system 0", {"x": 0, "y": 0, "z": 0})
+    for index in (0, 1, 2, 3):
+        assert store.get(f"System {index}") == {"x": index, "y": 0, "z": 0}
+
+    store.put_many([(f"System {index}", {"x": index, "y": 0, "z": 0}) for index in range(10, 13)])
+
+    names = set(store.get_all_names())
+    assert {"System 0", "System 1", "System 2", "System 3"} <= names
+    assert len(names) == 9
+    store.close()
+
+
+def test_access_times_are_saved_in_batches(tmp_path):
+    store = coordinates.CoordinateStore(str(tmp_path), access_batch_size=3)
+    store.put("Sol", {"x": 0, "y": 0, "z": 0})
+
+    def get_last_access():
+        return store.connection.execute("SELECT last_access FROM systems WHERE name = 'sol'").fetchone()[0]
+
+    saved_access = get_last_access()
+    store.get("Sol")
+    store.get("sol")
+    assert get_last_access() == saved_access
+
+    store.close()
+    store = coordinates.CoordinateStore(str(tmp_path))
+    assert get_last_access() > saved_access
+    store.close()
+
+
+def test_backfill_skips_broken_journals(tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    (journal_dir / "Journal.2020-01-01T000000.01.log").write_bytes(
+        b'{"event":"FSDJump", "StarSystem":"Sol", "StarPos":[0.0,0.0,0.0]}\n'
+        b'{"event":"FSDJump", "StarSystem":"\\xff\\xfe", "StarPos":[1.0, 1.0]}\n\xff\xfe\x00\n')
+    (journal_dir / "Journal.2020-01-02T000000.01.log").write_bytes(
+        b'\x89\xff{"event":"FSDJump", "StarSystem":"Achenar", "StarPos":[67.5,-119.47,24.84]}\n')
+    (journal_dir / "Journal.2020-01-03T000000.01.log").mkdir()
+
+    store = coordinates.CoordinateStore(str(tmp_path))
+    store.backfill_from_journals(str(journal_dir), log_function=lambda *args: None, max_workers=1)
+
+    assert store.get("Sol") == {"x": 0.0, "y": 0.0, "z": 0.0}
+    assert store.get_meta("journal_backfill") == "done"
+    store.close()
+
+
+def test_closed_store_ignores_late_writes(tmp_path):
+    store = coordinates.CoordinateStore(str(tmp_path))
+    store.put("Sol", {"x": 0, "y": 0, "z": 0})
+    store.close()
+
+    # A backfill that is still running at shutdown must not fail or mark itself done
+    store.put("Achenar", {"x": 67.5, "y": -119.47, "z": 24.84})
+    store.set_meta("journal_backfill", "done")
+    assert store.get("Sol") is None
+    store.close()
+
+    store = coordinates.CoordinateStore(str(tmp_path))
+    assert store.get_all_names() == ["Sol"]
+    assert store.get_meta("journal_backfill") == ""
+    store.close()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import jump_physics
+
+FSD = jump_physics.FsdParameters(optimal_mass=1692.6, fuel_power=2.45, fuel_multiplier=.012, max_fuel_per_jump=5.2,
+                                 range_boost=10.5, base_mass=401.57, tank_size=32.0, internal_tank_size=1.07)
+
+
+def simulate_route_fuel(fsd, distances, supercharges, refuels, cargo, start_fuel):
+    """Jump one by one, the reference for the batched simulation"""
+
+    arrival_fuel = [start_fuel]
+    fuel_used = [0.0]
+    fuel = start_fuel
+    for index in range(1, len(distances)):
+        if refuels[index - 1] and index > 1:
+            fuel = fsd.tank_size
+        cost = float(jump_physics.get_fuel_cost(fsd, distances[index], fuel, cargo, supercharges[index]))
+        fuel -= cost
+        arrival_fuel.append(fuel)
+        fuel_used.append(cost)
+
+    return arrival_fuel, fuel_used
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_route_fuel_matches_sequential_simulation(seed):
+    rng = np.random.default_rng(seed)
+    count = 30
+    distances = np.concatenate([[0.0], rng.uniform(20, 70, count - 1)])
+    supercharges = np.where(rng.random(count) < .3, jump_physics.NEUTRON_SUPERCHARGE, 1.0)
+    distances *= supercharges
+    refuels = rng.random(count) < .2
+    cargo = float(rng.integers(0, 100))
+
+    arrival_fuel, fuel_used = jump_physics.get_route_fuel(FSD, distances, supercharges, refuels, cargo, 30.0)
+    expected_arrival_fuel, expected_fuel_used = simulate_route_fuel(FSD, distances, supercharges, refuels, cargo,
+                                                                    30.0)
+
+    assert arrival_fuel == pytest.approx(expected_arrival_fuel, abs=1e-5)
+    assert fuel_used == pytest.approx(expected_fuel_used, abs=1e-5)
+
+
+def test_route_fuel_without_refuel():
+    distances = [0.0] + [60.0] * 9
+
+    arrival_fuel, _ = jump_physics.get_route_fuel(FSD, distances)
+    expected_arrival_fuel, _ = simulate_route_fuel(FSD, distances, [1.0] * 10, [False] * 10, 0, FSD.tank_size)
+
+    assert arrival_fuel == pytest.approx(expected_arrival_fuel, abs=1e-5)
+
+
+def test_fuel_warnings():
+    distances = [0.0] + [60.0] * 9 + [200.0]
+    arrival_fuel, fuel_used = jump_physics.get_route_fuel(FSD, distances)
+
+    warnings = jump_physics.get_fuel_warnings(FSD, arrival_fuel, fuel_used)
+    # Low fuel towards the end of the route and the last jump is out of range
+    assert warnings[-1] == len(distances) - 1
+    assert all(arrival_fuel[index] < FSD.max_fuel_per_jump or fuel_used[index] > FSD.max_fuel_per_jump
+               for index in warnings)
+    assert 0 not in warnings
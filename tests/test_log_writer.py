@@ -0,0 +1,44 @@
+import os
+import gzip
+
+import log_writer
+
+
+def test_full_log_file_is_rotated(tmp_path):
+    writer = log_writer.LogWriter(str(tmp_path), max_file_size=1000)
+    for index in range(100):
+        writer.write(f"Line {index:<50}")
+    writer.close()
+
+    compressed_logs = [file for file in os.listdir(tmp_path) if file.endswith(".log.gz")]
+    [log_file] = [file for file in os.listdir(tmp_path) if file.endswith(".log")]
+    assert len(compressed_logs) > 1
+    assert os.path.getsize(tmp_path / log_file) < 1000 + 60
+
+    # No lines are lost when several files are rotated within a second
+    lines = (tmp_path / log_file).read_text().splitlines()
+    for file in compressed_logs:
+        with gzip.open(tmp_path / file, "rt") as f:
+            lines += f.read().splitlines()
+    assert len(lines) == 100
+
+
+def test_writer_survives_errors(tmp_path, capsys):
+    # The logs directory can not be created while a file has its name
+    logs_dir = tmp_path / "logs"
+    logs_dir.write_text("")
+
+    writer = log_writer.LogWriter(str(logs_dir))
+    writer.write("Lost line")
+    writer.write("Lost line")
+    writer.close()
+
+    # The loop is run again after the directory can be created
+    os.remove(logs_dir)
+    writer.write("Written line")
+    writer.queue.put(None)
+    writer.writer_loop()
+
+    assert capsys.readouterr().out.count("Could not write log file") == 1
+    [log_file] = os.listdir(logs_dir)
+    assert (logs_dir / log_file).read_text() == "Written line\n"
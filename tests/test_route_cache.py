@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+
+import benchmark
+import route_cache
+import route_model
+
+DISTANCE_TO_DESTINATION = {"simple": "distance_left", "exact": "distance_to_destination"}
+
+
+def get_route_params(route_type: str, start_system: str, end_system: str) -> dict:
+    if route_type == "simple":
+        return route_cache.get_simple_route_params(60, 50, start_system, end_system)
+    payload = {"tank_size": 32.0, "is_supercharged": 0, "base_mass": 400.5, "cargo": 0}
+    return route_cache.get_exact_route_params(start_system, end_system, payload, False)
+
+
+@pytest.mark.parametrize("route_type", ["simple", "exact"])
+def test_suffix_matches_route_index(route_type):
+    route = benchmark.generate_route(20, route_type)
+    route_index = route_model.RouteIndex(route, route_type)
+
+    for start_index in range(len(route) - 1):
+        suffix = route_cache.get_route_suffix(route, start_index, route_type)
+        suffix_index = route_model.RouteIndex(suffix, route_type)
+
+        assert suffix_index.destination == route_index.destination
+        assert [hop.system for hop in suffix_index.next_hops] == \
+               [hop.system for hop in route_index.next_hops[start_index:]]
+        assert [hop.distance for hop in suffix_index.next_hops] == \
+               pytest.approx([hop.distance for hop in route_index.next_hops[start_index:]], abs=.011)
+
+        for field in route_cache.ROUTE_START_FIELDS[route_type]:
+            assert suffix[0][field] == 0
+
+        # Fields measured to the destination and single jumps are not changed
+        distance_field = DISTANCE_TO_DESTINATION[route_type]
+        assert [entry[distance_field] for entry in suffix] == [entry[distance_field] for entry in route[start_index:]]
+        assert suffix[1:] == route[start_index + 1:]
+
+
+@pytest.mark.parametrize("route_type", ["simple", "exact"])
+def test_get_slice(tmp_path, route_type):
+    route = benchmark.generate_route(20, route_type)
+    systems = [route_model.get_route_system_name(entry) for entry in route]
+
+    cache = route_cache.RouteCache(str(tmp_path))
+    cache.put(get_route_params(route_type, systems[0], systems[-1]), route)
+
+    sliced_route = cache.get_slice(get_route_params(route_type, systems[5], systems[-1]))
+    assert sliced_route == route_cache.get_route_suffix(route, 5, route_type)
+
+    assert cache.get_slice(get_route_params(route_type, systems[5], systems[-2])) is None
+
+
+def test_unindexed_files_are_evicted(tmp_path):
+    route = benchmark.generate_route(20, "simple")
+    systems = [route_model.get_route_system_name(entry) for entry in route]
+
+    # The cache only has room for the new route
+    cache = route_cache.RouteCache(str(tmp_path), max_size=len(gzip.compress(json.dumps(route).encode("utf-8"))))
+    old_route_file = tmp_path / "routes" / "sol_colonia.json.gz"
+    old_route_file.write_bytes(b"\0" * 1000)
+
+    cache.put(get_route_params("simple", systems[0], systems[-1]), route)
+
+    assert not old_route_file.exists()
+    assert cache.get(get_route_params("simple", systems[0], systems[-1])) == route
+
+
+def test_index_saves_are_batched(tmp_path):
+    route = benchmark.generate_route(20, "simple")
+    systems = [route_model.get_route_system_name(entry) for entry in route]
+    params = get_route_params("simple", systems[0], systems[-1])
+
+    cache = route_cache.RouteCache(str(tmp_path))
+    cache.put(params, route)
+    for _ in range(3):
+        cache.get(params)
+
+    assert route_cache.RouteCache(str(tmp_path)).stats()["hits"] == 0
+
+    cache.close()
+    assert route_cache.RouteCache(str(tmp_path)).stats()["hits"] == 3
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import jump_physics
+import route_planner
+
+SHIP_RANGE = 50
+
+
+@pytest.fixture(scope="module")
+def planner():
+    return route_planner.NeutronPlanner(dataset=route_planner.generate_synthetic_galaxy(20000, radius=2000, seed=1))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_plotted_route_is_valid(planner, seed):
+    dataset = planner.dataset
+    start_index, end_index = np.random.default_rng(seed).choice(len(dataset), 2, replace=False)
+    start_system, end_system = dataset.names[start_index], dataset.names[end_index]
+
+    route = planner.plot_route(start_system, end_system, SHIP_RANGE, log_function=lambda *args: None)
+
+    assert route[0]["system"] == start_system and route[-1]["system"] == end_system
+    assert route[0]["jumps"] == 0 and route[-1]["distance_left"] == 0
+
+    for previous_entry, route_entry in zip(route, route[1:]):
+        index = dataset.find(route_entry["system"])
+        assert index != -1
+        assert route_entry["neutron_star"] == dataset.neutron[index]
+        assert route_entry["jumps"] >= 1
+
+        # The first jump of a leg is supercharged if it starts at a neutron star, all others use the plain range
+        first_jump_range = SHIP_RANGE * (jump_physics.NEUTRON_SUPERCHARGE if previous_entry["neutron_star"] else 1)
+        assert route_entry["distance_jumped"] <= first_jump_range + (route_entry["jumps"] - 1) * SHIP_RANGE + .01
+
+        position = np.array([route_entry["x"], route_entry["y"], route_entry["z"]])
+        previous_position = np.array([previous_entry["x"], previous_entry["y"], previous_entry["z"]])
+        assert route_entry["distance_jumped"] == pytest.approx(np.linalg.norm(position - previous_position), abs=.01)
+
+    # Neutron stars make the route shorter than jumping the direct line
+    direct_jumps = planner.get_jumps(route[0]["distance_left"], SHIP_RANGE, False)
+    assert sum(route_entry["jumps"] for route_entry in route) <= direct_jumps
+
+
+def test_unknown_system(planner):
+    messages = []
+    assert planner.plot_route("Sol", "Synthetic 1", SHIP_RANGE, log_function=messages.append) == []
+    assert messages == ["ERROR OCCURRED: System Sol is not part of the local star data"]
@@ -0,0 +1,60 @@
+import os
+import json
+import glob
+
+import pytest
+
+import module_data
+import ship_stats
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHIP_BUILD_FILES = sorted(glob.glob(os.path.join(REPO_DIR, "tests", "data", "ship_builds", "*.json")))
+
+
+def load_ship_build(filename: str) -> dict:
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def modules(tmp_path):
+    return module_data.ModuleData(str(tmp_path), REPO_DIR)
+
+
+@pytest.mark.parametrize("filename", SHIP_BUILD_FILES, ids=os.path.basename)
+def test_matches_coriolis(modules, filename):
+    fixture = load_ship_build(filename)
+    if fixture["coriolis"] is None:
+        pytest.skip("coriolis conversion not recorded, run tests/record_ship_builds.py")
+
+    build = ship_stats.convert_loadout_event(fixture["loadout"], modules)
+    # Builds that can not be calculated locally are converted by coriolis
+    if build is not None:
+        assert ship_stats.compare_builds(build, fixture["coriolis"], modules) == []
+
+
+def test_overcharge_fsd_is_converted_by_coriolis(modules):
+    fixture = load_ship_build(os.path.join(REPO_DIR, "tests", "data", "ship_builds", "krait_mkii_overcharge_5a.json"))
+    assert ship_stats.convert_loadout_event(fixture["loadout"], modules) is None
+
+
+def test_known_fsd_is_calculated(modules):
+    fixture = load_ship_build(os.path.join(REPO_DIR, "tests", "data", "ship_builds", "anaconda_5a.json"))
+    build = ship_stats.convert_loadout_event(fixture["loadout"], modules)
+    assert build["components"]["standard"]["frameShiftDrive"] == {"class": 5, "rating": "A", "optmass": 1050,
+                                                                  "maxfuel": 5}
+
+
+def test_compare_builds_checks_route_fsd_values(modules):
+    fixture = load_ship_build(os.path.join(REPO_DIR, "tests", "data", "ship_builds",
+                                           "anaconda_5a_engineered_booster.json"))
+    build = ship_stats.convert_loadout_event(fixture["loadout"], modules)
+
+    # Same stats, but the coriolis build has an unengineered FSD and no booster
+    coriolis_build = {"stats": dict(build["stats"]), "components": {
+        "standard": {"frameShiftDrive": {"class": 5, "rating": "A"}}, "internal": [None]}}
+
+    differences = {name: (value, coriolis_value)
+                   for name, value, coriolis_value in ship_stats.compare_builds(build, coriolis_build, modules)}
+    assert differences == {"frameShiftDrive.optimal_mass": (1693, 1050), "frameShiftDrive.max_fuel_per_jump": (5.2, 5),
+                           "frameShiftDrive.range_boost": (10.5, 0.0)}
@@ -0,0 +1,519 @@
+import os
+import sys
+import math
+import time
+import queue
+import signal
+import threading
+
+import utils
+import api_access
+import journal
+import coordinates
+import route_model
+import configuration
+import log_writer
+import system_index
+import route_cache
+import module_data
+import ship_stats
+
+
+def get_config_path() -> str:
+    if os.name == "nt":
+        return os.path.join(os.getenv("APPDATA"), "EDNeutronAssistant")
+    return os.path.join(os.path.expanduser("~"), ".config", "EDNeutronAssistant")
+
+
+class TrackerObserver:
+    """Receives state changes of a RouteTracker. All methods are called from the thread that made the change, mostly
+    the application loop"""
+
+    def on_log(self, entry: str):
+        pass
+
+    def on_commander_name(self, name: str):
+        pass
+
+    def on_current_system(self, system: str):
+        pass
+
+    def on_jump_range(self, jump_range: float):
+        pass
+
+    def on_next_system(self, system: str, distance: float, jumps: int, is_neutron: bool, current: int, total: int,
+                       destination: str):
+        pass
+
+    def on_route_completed(self, total: int):
+        pass
+
+    def on_route_reset(self):
+        pass
+
+
+class QueueObserver:
+    """Puts all state changes of a RouteTracker into a queue as (event, args) tuples, so that they can be handled on
+    another thread, e.g. by Tk widgets in the Tk main loop"""
+
+    def __init__(self, events: queue.Queue):
+        self.events = events
+
+    def __getattr__(self, event: str):
+        if not event.startswith("on_"):
+            raise AttributeError(event)
+        return lambda *args: self.events.put((event, args))
+
+
+class ConsoleObserver(TrackerObserver):
+    """Prints the route status to stdout, log entries are already printed by the tracker"""
+
+    def on_next_system(self, system: str, distance: float, jumps: int, is_neutron: bool, current: int, total: int,
+                       destination: str):
+        print(f"{time.strftime('%T')} Next system {system}   {distance} ly   {jumps} {'Jumps' if jumps > 1 else 'Jump'}"
+              f"   Neutron: {'yes' if is_neutron else 'no'}   [{current}/{total}] to {destination}", flush=True)
+
+    def on_route_completed(self, total: int):
+        print(f"{time.strftime('%T')} Reached destination after {total} systems", flush=True)
+
+
+class RouteTracker:
+    """Core of the application without any user interface. Follows the journal of the game, tracks the progress along
+    the current route, copies the next system to the clipboard and persists the state in the configuration"""
+
+    def __init__(self, config_path: str, data_path: str, verbose: bool = False, poll_rate: float = 1):
+        self.config_path = config_path
+        self.verbose = verbose
+        self.poll_rate = poll_rate
+
+        self.observers = []
+        self.route_index = None
+        self.loop_stopped = threading.Event()
+        self.loop_stopped.set()
+        # System that EDSM does not know, not looked up again until the commander jumps
+        self.unknown_position_system = None
+
+        # Wakes up the application loop when the game writes to its journal
+        self.journal_watcher = journal.JournalWatcher(poll_rate=self.poll_rate)
+
+        # Only the defaults until start() loads the saved configuration
+        self.configuration = configuration.Configuration(self.config_path, {
+            "current_system": "", "ship_coriolis_build": {}, "jump_range_coriolis": 0, "jump_range_log": 0,
+            "commander_name": "", "route": [], "exiting": False}, log_function=self.print_log)
+
+        # Creating working directory
+        if not os.path.isdir(self.config_path):
+            os.makedirs(self.config_path)
+
+        self.log_writer = log_writer.LogWriter(os.path.join(self.config_path, "logs"))
+        self.coordinate_store = coordinates.CoordinateStore(self.config_path)
+        self.route_cache = route_cache.RouteCache(self.config_path)
+        self.module_data = module_data.ModuleData(self.config_path, data_path)
+        self.system_name_index = system_index.SystemNameIndex(os.path.join(self.config_path, "systems.idx"))
+
+        # The planner and with it numpy are only loaded when a route is plotted locally
+        self.star_data_filename = os.path.join(self.config_path, "stars.npz")
+        self._route_planner = None
+
+    @property
+    def route_planner(self):
+        if self._route_planner is None:
+            import route_planner
+            self._route_planner = route_planner.NeutronPlanner(self.star_data_filename)
+        return self._route_planner
+
+    def add_observer(self, observer: TrackerObserver):
+        self.observers.append(observer)
+
+    def notify(self, event: str, *args):
+        for observer in self.observers:
+            getattr(observer, event)(*args)
+
+    def load_configuration(self):
+        self.configuration.load()
+
+        self.configuration["current_system_display"] = ""
+        self.configuration["jump_range_coriolis_display"] = 0
+        self.configuration["commander_name_display"] = ""
+
+        self.configuration["exiting"] = False
+        self.configuration["last_copied"] = ""
+
+        self.write_config()
+
+    def start(self):
+        """Load the configuration and start following the journal and the background tasks"""
+
+        self.print_log("Initializing")
+
+        self.load_configuration()
+
+        threading.Thread(target=self.application_loop).start()
+        threading.Thread(target=self.backfill_coordinates).start()
+        threading.Thread(target=self.module_data.update, kwargs={"log_function": self.print_log},
+                         daemon=True).start()
+
+        if "route" in self.configuration and self.configuration["route"]:
+            self.print_log("Found existing route")
+            self.coordinate_store.put_many(coordinates.get_route_coordinates(self.configuration["route"]))
+
+        self.print_log("Initialization complete")
+
+    def stop(self, timeout: float = 30):
+        """Stop the application loop and close all files once it has ended, waits at most timeout seconds for the
+        loop, e.g. if it is waiting for a request"""
+
+        self.configuration["exiting"] = True
+        self.journal_watcher.wake()
+        api_access.SPANSH_JOB_POLLER.cancel_all()
+
+        if not self.loop_stopped.wait(timeout):
+            self.print_log("Application loop did not stop in time")
+
+        self.configuration.close()
+        self.route_cache.close()
+        self.coordinate_store.close()
+        self.log_writer.close()
+
+    def print_log(self, *args):
+        """Print content to file and console along with a timestamp"""
+
+        t = time.strftime("%T")
+        print(t, *args)
+
+        entry = t + " "
+        for arg in args:
+            entry += arg
+
+        self.notify("on_log", entry)
+
+        self.log_writer.write(entry)
+
+    def write_config(self):
+        """Writes the current configuration to the config file in the background"""
+        self.configuration.request_save()
+        if self.verbose:
+            self.print_log("Saving configuration to file")
+
+    def load_route(self, route_systems: list, route_type: str):
+        """Replace the current route, e.g. with a newly calculated one"""
+
+        self.print_log(f"Loaded route of {len(route_systems)} systems")
+        self.coordinate_store.put_many(coordinates.get_route_coordinates(route_systems))
+        self.configuration["route"] = route_systems
+        self.configuration["route_type"] = route_type
+        self.configuration["route_progress"] = -1
+        self.write_config()
+
+        # Show the first system of the new route without waiting for the next journal entry
+        self.journal_watcher.wake()
+
+    def backfill_coordinates(self):
+        """Save the coordinates of all systems visited in previous game sessions and add all known systems to the
+        system name index"""
+        self.coordinate_store.backfill_from_journals(utils.get_game_log_directory(), log_function=self.print_log,
+                                                     verbose=self.verbose)
+        self.update_system_name_index()
+
+    def update_system_name_index(self, dump_filename: str = ""):
+        """Add all visited and plotted systems and optionally the systems of a dump file to the system name index"""
+
+        names = self.coordinate_store.get_all_names()
+
+        if dump_filename:
+            self.print_log(f"Importing system names from {dump_filename}")
+            names += system_index.read_names_from_dump(dump_filename)
+
+        self.system_name_index.rebuild(names)
+
+        if self.verbose:
+            self.print_log(f"Indexed {len(self.system_name_index)} system names")
+
+    def import_star_data(self, dump_filename: str):
+        """Build the star data of the local route planner from a dump file"""
+
+        import route_planner
+
+        self.print_log(f"Importing star data from {dump_filename}")
+        dataset = route_planner.StarDataset.from_dump(dump_filename)
+        dataset.save(self.star_data_filename)
+
+        self._route_planner = route_planner.NeutronPlanner(self.star_data_filename, dataset=dataset)
+        self.print_log(f"Imported {len(dataset)} systems, {int(dataset.neutron.sum())} of them neutron stars")
+
+    def verify_ship_build(self, loadout_event: dict, build: dict):
+        """Compare a locally calculated ship build with the coriolis conversion of the same loadout event"""
+        import requests
+
+        try:
+            coriolis_build = api_access.convert_loadout_event_to_coriolis(loadout_event)
+        except (requests.RequestException, ValueError) as e:
+            self.print_log(f"Could not verify ship build: {e}")
+            return
+
+        differences = ship_stats.compare_builds(build, coriolis_build, self.module_data)
+        if differences:
+            for stat, value, coriolis_value in differences:
+                self.print_log(f"Ship build differs from coriolis: {stat} is {value}, coriolis {coriolis_value}")
+        else:
+            self.print_log("Ship build matches coriolis conversion")
+
+    def application_loop(self):
+        """Main loop of application running checks whenever the game writes to its journal, or in time intervals of
+        self.poll_rate if the journal directory can not be watched"""
+
+        def update_commander_name(journal_state_: journal.JournalState):
+
+            def set_commander_name(name: str):
+                self.notify("on_commander_name", name)
+                self.configuration["commander_name_display"] = name
+                self.configuration["commander_name"] = name
+                self.write_config()
+
+            log_commander_name = journal_state_.commander_name
+            config_commander_name = self.configuration["commander_name"]
+            displayed_commander_name = self.configuration["commander_name_display"]
+
+            # case 1: log commander name is not blank
+            # -> if name not already displayed, set log name
+            if log_commander_name != "":
+                if displayed_commander_name != log_commander_name:
+                    set_commander_name(log_commander_name)
+
+            # case 2: log commander name is blank
+            # -> if name not already displayed, set config name
+            else:
+                if displayed_commander_name != config_commander_name:
+                    set_commander_name(config_commander_name)
+
+        def update_current_system(journal_state_: journal.JournalState):
+
+            def set_current_system(system: str):
+                self.print_log(f"Entered system {system}")
+
+                # Update configuration
+                self.configuration["current_system"] = system
+                self.configuration["current_system_display"] = system
+
+                self.write_config()
+
+                self.notify("on_current_system", system)
+
+            log_current_system = journal_state_.current_system
+            config_current_system = self.configuration["current_system"]
+            displayed_current_system = self.configuration["current_system_display"]
+
+            # case 1: log current system is not blank
+            # -> if not already set, set log current system
+            if log_current_system != "":
+                if displayed_current_system != log_current_system:
+                    set_current_system(log_current_system)
+
+            # case 2: log current system is blank
+            # ->  if not already set, set config current system
+            else:
+                if displayed_current_system != config_current_system:
+                    set_current_system(config_current_system)
+
+        def update_ship_build(journal_state_: journal.JournalState):
+
+            def set_new_ship_build(loadout_event: dict):
+
+                # Calculate the build locally, the coriolis conversion is only needed for unknown modules
+                build = ship_stats.convert_loadout_event(loadout_event, self.module_data)
+                if build is None:
+                    self.print_log("Ship contains unknown modules, converting build with coriolis")
+                    build = api_access.convert_loadout_event_to_coriolis(loadout_event)
+                elif self.verbose:
+                    threading.Thread(target=self.verify_ship_build, args=(loadout_event, build), daemon=True).start()
+                jump_range_coriolis = build["stats"]["fullTankRange"]
+
+                self.configuration["ship_coriolis_build"] = build
+                self.configuration["jump_range_coriolis"] = jump_range_coriolis
+                self.configuration["jump_range_coriolis_display"] = jump_range_coriolis
+                self.configuration["jump_range_log"] = round(loadout_event["MaxJumpRange"], 2)
+
+                self.write_config()
+
+                self.notify("on_jump_range", jump_range_coriolis)
+
+            def update_displayed_jump_range(jump_range: float):
+                self.configuration["jump_range_coriolis_display"] = jump_range
+                self.notify("on_jump_range", jump_range)
+
+            # To test if the ship build has changed, we compare the "MaxJumpRange" attribute of the game log, to avoid
+            # unnecessary conversions to coriolis builds
+
+            latest_log_loadout_event = journal_state_.latest_loadout_event
+            # Saved along with the coriolis build, avoids loading the build
+            config_coriolis_build_jump_range = self.configuration["jump_range_coriolis"]
+            config_ship_log_range = self.configuration["jump_range_log"]
+            displayed_ship_jump_range = self.configuration["jump_range_coriolis_display"]
+
+            # case 1: no log loadout events were found
+            # -> if configuration contains coriolis build, use it to update display
+            if not latest_log_loadout_event:
+                if config_coriolis_build_jump_range:
+                    if config_coriolis_build_jump_range != displayed_ship_jump_range:
+                        update_displayed_jump_range(config_coriolis_build_jump_range)
+
+            # case 2: log loadout event was found
+            # -> compare log jump range to config log jump range, if not equal, update build
+            else:
+                new_build_log_jump_range = round(latest_log_loadout_event["MaxJumpRange"], 2)
+                if new_build_log_jump_range != config_ship_log_range:
+                    set_new_ship_build(latest_log_loadout_event)
+
+                # If jump range was not displayed yet, set saved coriolis range
+                elif not displayed_ship_jump_range:
+                    update_displayed_jump_range(config_coriolis_build_jump_range)
+
+        def get_rejoin_information(route_index: route_model.RouteIndex,
+                                   journal_state_: journal.JournalState) -> (int, float, int):
+            """Return index of, distance to and jumps to the system to rejoin the route at, None if the position of the
+            current system is unknown"""
+
+            current_system = self.configuration["current_system"]
+
+            # Use the journal position if possible, avoids a coordinate lookup
+            if journal_state_.star_pos and journal_state_.star_pos_system == current_system:
+                current_position = journal_state_.star_pos
+            elif current_system == self.unknown_position_system:
+                return None
+            else:
+                try:
+                    current_position = api_access.get_system_coordinates(current_system,
+                                                                         coordinate_store=self.coordinate_store,
+                                                                         log_function=self.print_log,
+                                                                         verbose=self.verbose)
+                except api_access.CoordinatesUnavailableError as e:
+                    # Tried again on the next journal change
+                    self.print_log(str(e))
+                    return None
+
+                if current_position is None:
+                    self.print_log(f"Position of {current_system} is unknown, can not find the route system to rejoin "
+                                   "at")
+                    self.unknown_position_system = current_system
+                    return None
+
+            # Do not send the commander back to systems before the last visited route system
+            min_index = self.configuration.get("route_progress", -1) + 1
+
+            index_next_system, distance = route_index.rejoin_engine.find_rejoin_index(current_position,
+                                                                                      min_index=min_index)
+
+            jump_range = self.configuration["jump_range_coriolis"]
+            jumps = max(1, math.ceil(distance / jump_range)) if jump_range else 1
+
+            return index_next_system, distance, jumps
+
+        def update_route(route_index: route_model.RouteIndex, journal_state_: journal.JournalState):
+
+            # Get current system from configuration
+            current_system = self.configuration["current_system"]
+
+            index_current_system = route_index.find_progress_index(current_system,
+                                                                   self.configuration.get("route_progress", -1))
+
+            # Get next system and next system information
+            if index_current_system != -1:
+                # Check if route is completed
+                if index_current_system == len(route_index) - 1:
+                    self.print_log("Route completed")
+                    self.configuration["route"] = []
+                    self.configuration["route_progress"] = -1
+                    self.notify("on_route_completed", len(route_index))
+                    return
+                else:
+                    next_system, next_system_distance, next_system_jumps, next_system_is_neutron = \
+                        route_index.next_hops[index_current_system]
+
+                    self.configuration["route_progress"] = index_current_system
+            else:
+                # Current system is off route
+                rejoin_information = get_rejoin_information(route_index, journal_state_)
+                if rejoin_information is None:
+                    return
+                index_next_system, next_system_distance, next_system_jumps = rejoin_information
+                index_current_system = index_next_system - 1
+                next_system = route_index.systems[index_next_system]
+                next_system_is_neutron = route_index.neutron_flags[index_next_system]
+
+            if next_system:
+                if next_system != self.configuration["last_copied"]:
+                    self.notify("on_next_system", next_system, next_system_distance, next_system_jumps,
+                                next_system_is_neutron, index_current_system + 1, len(route_index),
+                                route_index.destination)
+                    utils.copy_system_to_clipboard(next_system, log_function=self.print_log)
+                    self.configuration["last_copied"] = next_system
+            else:
+                self.notify("on_route_reset")
+
+        # Set once the loop has ended, stop() waits for it before closing the files the loop writes to
+        self.loop_stopped.clear()
+        try:
+            journal_tailer = journal.JournalTailer()
+            # Positions found in the journal are saved after the next system was copied, one write per loop iteration
+            new_star_positions = []
+            journal_state = journal.JournalState(
+                on_star_pos=lambda system, position: new_star_positions.append((system, position)))
+
+            while 1:
+                # Read new game log entries
+                new_lines = journal_tailer.read_new_lines(log_function=self.print_log, verbose=self.verbose)
+
+                # Entries of previous journal files belong to an older game session
+                if journal_tailer.rotated:
+                    journal_state.reset()
+                journal_state.consume_lines(new_lines)
+
+                try:
+                    update_commander_name(journal_state)
+                    update_current_system(journal_state)
+                    update_ship_build(journal_state)
+                except RuntimeError:
+                    continue
+
+                if "route" in self.configuration and self.configuration["route"]:
+                    # Only index a route once when it is loaded
+                    if self.route_index is None or self.route_index.route is not self.configuration["route"]:
+                        self.route_index = route_model.RouteIndex(self.configuration["route"],
+                                                                  self.configuration["route_type"])
+                    update_route(self.route_index, journal_state)
+
+                if new_star_positions:
+                    self.coordinate_store.put_many(new_star_positions)
+                    new_star_positions.clear()
+
+                if self.configuration["exiting"]:
+                    break
+
+                self.journal_watcher.wait(journal_tailer.file_directory, log_function=self.print_log,
+                                          verbose=self.verbose)
+
+            self.journal_watcher.close()
+        finally:
+            self.loop_stopped.set()
+
+
+def run_headless(route_tracker: RouteTracker):
+    """Follow the journal without a window until interrupted or terminated"""
+
+    stop_event = threading.Event()
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+
+    route_tracker.add_observer(ConsoleObserver())
+    route_tracker.start()
+
+    try:
+        # Waiting with a timeout keeps the main thread responsive to KeyboardInterrupt on Windows
+        while not stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+
+    route_tracker.print_log("Exiting")
+    route_tracker.stop()
+    sys.stdout.flush()
@@ -1,15 +1,12 @@
 import os
 import json
-import clipboard
 import gzip
 import io
 import base64
 
-import api_access
 
-
-def parse_game_log(log_function=print, verbose=False) -> list:
-    """Parses the Elite: Dangerous logfiles to retrieve information about the game"""
+def get_game_log_directory(log_function=print, verbose=False) -> str:
+    """Return the directory the game writes its journal files to, empty string if os is not supported"""
 
     # Check OS
     if verbose:
@@ -18,13 +15,22 @@ def parse_game_log(log_function=print, verbose=False) -> list:
     # Get log file directory
     if os.name == "nt":
         windows_username = os.getlogin()
-        file_directory = "C:\\Users\\" + windows_username + "\\Saved Games\\Frontier Developments\\Elite Dangerous"
+        return "C:\\Users\\" + windows_username + "\\Saved Games\\Frontier Developments\\Elite Dangerous"
     elif os.name == "posix":
         linux_home_dir = os.path.expanduser("~")
-        file_directory = f"{linux_home_dir}/.local/share/Steam/steamapps/compatdata/359320/pfx/drive_c/users/" \
-                         f"steamuser/Saved Games/Frontier Developments/Elite Dangerous/"
+        return f"{linux_home_dir}/.local/share/Steam/steamapps/compatdata/359320/pfx/drive_c/users/" \
+               f"steamuser/Saved Games/Frontier Developments/Elite Dangerous/"
     else:
         log_function("Unsupported os")
+        return ""
+
+
+def parse_game_log(log_function=print, verbose=False) -> list:
+    """Parses the Elite: Dangerous logfiles to retrieve information about the game"""
+
+    file_directory = get_game_log_directory(log_function=log_function, verbose=verbose)
+
+    if not file_directory:
         return []
 
     if verbose:
@@ -176,23 +182,9 @@ def test_if_builds_has_jump_range(build: dict, jump_range: float) -> bool:
     return True if round(build["MaxJumpRange"], 2) == jump_range else False
 
 
-def get_nearest_system_in_route(plotter_data: list, current_system: str) -> str:
-    """Calculate which system of a route is the nearest to the current system, can take a long time to process"""
-    all_systems = []
-    for entry in plotter_data:
-        all_systems.append(entry["system"])
-
-    all_distances = {}
-    for system in all_systems:
-        distance = api_access.get_distance_between_systems(system, current_system)
-        all_distances[system] = distance
-        print(f"Distance to {system} is {distance}")
-
-    return min(all_distances, key=all_distances.get)
-
-
 def copy_system_to_clipboard(system: str, log_function=print):
     """Copy a system into the commanders clipboard"""
+    import clipboard
     clipboard.copy(system)
     log_function(f"Copied system {system} to clipboard")
 